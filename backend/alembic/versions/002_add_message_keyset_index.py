@@ -0,0 +1,27 @@
+"""add message keyset index
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Composite index so each page of message history is a bounded range scan
+    op.create_index(
+        'ix_messages_conversation_id_created_at_id',
+        'messages',
+        ['conversation_id', 'created_at', 'id'],
+        unique=False
+    )
+
+def downgrade():
+    op.drop_index('ix_messages_conversation_id_created_at_id', table_name='messages')
@@ -0,0 +1,40 @@
+"""add search fulltext indexes
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+# Searchable tables; FULLTEXT(title, description) backs MATCH ... AGAINST
+SEARCH_TABLES = ['research', 'events', 'resources']
+
+def _fulltext_tables():
+    bind = op.get_bind()
+    # Only MySQL has FULLTEXT; other dialects use the in-process index
+    if bind.dialect.name != 'mysql':
+        return []
+    inspector = sa.inspect(bind)
+    return [table for table in SEARCH_TABLES if inspector.has_table(table)]
+
+def upgrade():
+    for table in _fulltext_tables():
+        op.create_index(
+            f'ft_{table}_title_description',
+            table,
+            ['title', 'description'],
+            unique=False,
+            mysql_prefix='FULLTEXT'
+        )
+
+def downgrade():
+    for table in _fulltext_tables():
+        op.drop_index(f'ft_{table}_title_description', table_name=table)
@@ -0,0 +1,48 @@
+"""add notification feed indexes and unread count
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index(
+        'ix_notifications_user_id_read_created_at',
+        'notifications',
+        ['user_id', 'read', 'created_at'],
+        unique=False
+    )
+    op.create_index(
+        'ix_notifications_user_id_created_at_id',
+        'notifications',
+        ['user_id', 'created_at', 'id'],
+        unique=False
+    )
+
+    op.add_column(
+        'users',
+        sa.Column('unread_notification_count', sa.Integer(), nullable=False, server_default='0')
+    )
+
+    # Backfill the counter from existing notifications
+    users = sa.table('users', sa.column('id'), sa.column('unread_notification_count'))
+    notifications = sa.table('notifications', sa.column('id'), sa.column('user_id'), sa.column('read'))
+    unread = sa.select(sa.func.count(notifications.c.id)).where(
+        notifications.c.user_id == users.c.id,
+        notifications.c.read == sa.false()
+    ).scalar_subquery()
+    op.execute(users.update().values(unread_notification_count=unread))
+
+def downgrade():
+    op.drop_column('users', 'unread_notification_count')
+    op.drop_index('ix_notifications_user_id_created_at_id', table_name='notifications')
+    op.drop_index('ix_notifications_user_id_read_created_at', table_name='notifications')
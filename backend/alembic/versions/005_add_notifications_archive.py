@@ -0,0 +1,35 @@
+"""add notifications archive
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Destination for notifications purged by retention when NOTIFICATION_ARCHIVE=table
+    op.create_table(
+        'notifications_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('type', sa.String(50), nullable=False),
+        sa.Column('message', sa.String(255), nullable=False),
+        sa.Column('data', sa.JSON(), nullable=True),
+        sa.Column('read', sa.Boolean(), default=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_notifications_archive_user_id'), 'notifications_archive', ['user_id'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_notifications_archive_user_id'), table_name='notifications_archive')
+    op.drop_table('notifications_archive')
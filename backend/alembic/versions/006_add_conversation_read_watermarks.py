@@ -0,0 +1,71 @@
+"""add conversation read watermarks
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+def _tables():
+    conversations = sa.table(
+        'conversations',
+        sa.column('id'),
+        sa.column('user1_id'),
+        sa.column('user2_id'),
+        sa.column('user1_last_read_message_id'),
+        sa.column('user2_last_read_message_id')
+    )
+    messages = sa.table(
+        'messages', sa.column('id'), sa.column('conversation_id'), sa.column('sender_id'), sa.column('read')
+    )
+    return conversations, messages
+
+def _watermark(conversations, messages, other_column):
+    # Everything below the other participant's oldest unread message counts
+    # as read; with nothing unread, the whole conversation does
+    first_unread = sa.select(sa.func.min(messages.c.id)).where(
+        messages.c.conversation_id == conversations.c.id,
+        messages.c.sender_id == other_column,
+        messages.c.read == sa.false()
+    ).scalar_subquery()
+    latest = sa.select(sa.func.max(messages.c.id)).where(
+        messages.c.conversation_id == conversations.c.id
+    ).scalar_subquery()
+    return sa.func.coalesce(first_unread - 1, latest, 0)
+
+def upgrade():
+    op.add_column(
+        'conversations',
+        sa.Column('user1_last_read_message_id', sa.Integer(), nullable=False, server_default='0')
+    )
+    op.add_column(
+        'conversations',
+        sa.Column('user2_last_read_message_id', sa.Integer(), nullable=False, server_default='0')
+    )
+
+    # Backfill from the per-message read flags
+    conversations, messages = _tables()
+    op.execute(conversations.update().values(
+        user1_last_read_message_id=_watermark(conversations, messages, conversations.c.user2_id),
+        user2_last_read_message_id=_watermark(conversations, messages, conversations.c.user1_id)
+    ))
+
+def downgrade():
+    # Turn the watermarks back into per-message read flags
+    conversations, messages = _tables()
+    recipient_watermark = sa.select(sa.case(
+        (conversations.c.user1_id == messages.c.sender_id, conversations.c.user2_last_read_message_id),
+        else_=conversations.c.user1_last_read_message_id
+    )).where(conversations.c.id == messages.c.conversation_id).scalar_subquery()
+    op.execute(messages.update().values(read=messages.c.id <= recipient_watermark))
+
+    op.drop_column('conversations', 'user2_last_read_message_id')
+    op.drop_column('conversations', 'user1_last_read_message_id')
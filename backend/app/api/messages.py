@@ -1,48 +1,262 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
-from typing import List
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket
+from typing import Dict, List, Optional
+from datetime import datetime
+from sqlalchemy import and_, bindparam, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
-from app.models import Conversation, Message, User
+from app.db.warmup import hot_statement
+from app.models import Conversation, Message
 from app.schemas.message import (
     ConversationCreate,
+    ConversationPage,
     ConversationResponse,
     MessageCreate,
+    MessagePage,
     MessageResponse
 )
-from app.core.auth import get_current_user
-from app.core.websocket import ConnectionManager
+from app.core.auth import CurrentUser, get_current_user
+from app.core.conditional import cache_headers, make_etag, not_modified
+from app.core.message_writer import message_writer
+from app.core.pagination import decode_cursor, encode_cursor, keyset_after, keyset_before
+from app.core.responses import FastJSONResponse, rows_as_dicts
+from app.core.websocket import ConnectionManager, authenticate_websocket, receive_frame
 
 router = APIRouter()
-manager = ConnectionManager()
+manager = ConnectionManager("messages")
 
-@router.get("/conversations", response_model=List[ConversationResponse])
+# The stored columns of a MessageResponse, fetched as plain rows for list pages
+MESSAGE_FIELDS = (
+    Message.id,
+    Message.conversation_id,
+    Message.sender_id,
+    Message.content,
+    Message.created_at,
+)
+
+# Hot statements, built once with bound parameters. Constructing a select
+# costs more than running it on an indexed lookup; these are reused as is
+# and find their compiled SQL in the engine's cache. hot_statement() also
+# registers them to be compiled by the startup warmup.
+IS_PARTICIPANT = (Conversation.user1_id == bindparam("current_user_id")) | (
+    Conversation.user2_id == bindparam("current_user_id")
+)
+
+# Keyset pagination position, filled from a decoded cursor
+_cursor = (bindparam("cursor_at"), bindparam("cursor_id"))
+
+# The conversation, if the current user takes part in it
+CONVERSATION_FOR_USER = hot_statement(
+    select(Conversation).where(Conversation.id == bindparam("conversation_id"), IS_PARTICIPANT),
+    conversation_id=0, current_user_id=0
+)
+
+# ETag validator of a user's conversation list: new messages bump
+# updated_at, new or deleted conversations move the count, and reading on
+# either side raises a watermark
+CONVERSATIONS_VALIDATOR = hot_statement(
+    select(
+        func.count(Conversation.id),
+        func.max(Conversation.updated_at),
+        func.sum(Conversation.user1_last_read_message_id + Conversation.user2_last_read_message_id)
+    ).where(IS_PARTICIPANT),
+    current_user_id=0
+)
+
+# Rows written outside the ORM may have no updated_at; they page as the
+# oldest conversations rather than breaking the keyset
+NEVER_UPDATED = datetime(1970, 1, 1)
+CONVERSATION_UPDATED_AT = func.coalesce(Conversation.updated_at, NEVER_UPDATED)
+
+CONVERSATIONS_PAGE = hot_statement(
+    select(Conversation).where(IS_PARTICIPANT).order_by(
+        CONVERSATION_UPDATED_AT.desc(), Conversation.id.desc()
+    ).limit(bindparam("limit")),
+    current_user_id=0, limit=1
+)
+CONVERSATIONS_PAGE_BEFORE = hot_statement(
+    CONVERSATIONS_PAGE.where(keyset_before(CONVERSATION_UPDATED_AT, Conversation.id, *_cursor)),
+    current_user_id=0, limit=1, cursor_at=datetime(1970, 1, 1), cursor_id=0
+)
+
+# Latest message of each of the given conversations, in one pass
+_ranked = select(
+    Message.id.label("message_id"),
+    func.row_number().over(
+        partition_by=Message.conversation_id,
+        order_by=(Message.created_at.desc(), Message.id.desc())
+    ).label("position")
+).where(Message.conversation_id.in_(bindparam("conversation_ids", expanding=True))).subquery()
+LAST_MESSAGES = hot_statement(
+    select(*MESSAGE_FIELDS).join(_ranked, Message.id == _ranked.c.message_id).where(_ranked.c.position == 1),
+    conversation_ids=[0]
+)
+
+# Pages of a conversation's history: the latest, older than a cursor
+# (both newest first) and newer than a cursor (oldest first)
+_messages = select(*MESSAGE_FIELDS).where(
+    Message.conversation_id == bindparam("conversation_id")
+).limit(bindparam("limit"))
+MESSAGES_LATEST = hot_statement(
+    _messages.order_by(Message.created_at.desc(), Message.id.desc()),
+    conversation_id=0, limit=1
+)
+MESSAGES_BEFORE = hot_statement(
+    MESSAGES_LATEST.where(keyset_before(Message.created_at, Message.id, *_cursor)),
+    conversation_id=0, limit=1, cursor_at=datetime(1970, 1, 1), cursor_id=0
+)
+MESSAGES_AFTER = hot_statement(
+    _messages.where(keyset_after(Message.created_at, Message.id, *_cursor)).order_by(
+        Message.created_at.asc(), Message.id.asc()
+    ),
+    conversation_id=0, limit=1, cursor_at=datetime(1970, 1, 1), cursor_id=0
+)
+
+def _mark_read(watermark):
+    # Move one participant's watermark up to the conversation's latest
+    # message. updated_at is set to itself so that reading doesn't reorder
+    # the list.
+    latest = select(func.max(Message.id)).where(
+        Message.conversation_id == bindparam("conversation_id")
+    ).scalar_subquery()
+    return hot_statement(
+        update(Conversation).where(Conversation.id == bindparam("conversation_id")).values(
+            {watermark: func.coalesce(latest, watermark), Conversation.updated_at: Conversation.updated_at}
+        ).execution_options(synchronize_session=False),
+        conversation_id=0
+    )
+
+MARK_READ_AS_USER1 = _mark_read(Conversation.user1_last_read_message_id)
+MARK_READ_AS_USER2 = _mark_read(Conversation.user2_last_read_message_id)
+
+def _message_item(message: Message, conversation: Conversation) -> dict:
+    # Read state comes from the recipient's watermark, not Message.read
+    return {
+        "id": message.id,
+        "conversation_id": message.conversation_id,
+        "sender_id": message.sender_id,
+        "content": message.content,
+        "read": conversation.is_read(message),
+        "created_at": message.created_at,
+    }
+
+async def _conversation_for_user(db: AsyncSession, conversation_id: int, user_id: int) -> Conversation:
+    """
+    The conversation, or a 404 if it doesn't exist or the user isn't in it
+    """
+    conversation = (await db.execute(
+        CONVERSATION_FOR_USER, {"conversation_id": conversation_id, "current_user_id": user_id}
+    )).scalars().first()
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation
+
+def _message_items(result, conversations: Dict[int, Conversation]) -> List[dict]:
+    """
+    MessageResponse dicts for rows of MESSAGE_FIELDS, without loading
+    Message objects
+    """
+    items = rows_as_dicts(result)
+    for item in items:
+        conversation = conversations[item["conversation_id"]]
+        reader_id = conversation.other_participant_id(item["sender_id"])
+        item["read"] = item["id"] <= conversation.last_read_message_id(reader_id)
+    return items
+
+@router.get("/conversations", response_model=ConversationPage)
 async def get_conversations(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    before: Optional[str] = Query(None, description="Cursor; return conversations updated before this position"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of conversations to return"),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
-    Get all conversations for the current user
+    Get the current user's conversations, most recently updated first, each
+    with its last message and unread count.
+
+    Uses a fixed number of queries per page regardless of how many
+    conversations are returned. Responses carry an ETag; a request whose
+    If-None-Match still matches gets a 304 after one aggregate query.
     """
-    conversations = db.query(Conversation).filter(
-        (Conversation.user1_id == current_user.id) |
-        (Conversation.user2_id == current_user.id)
-    ).order_by(Conversation.updated_at.desc()).all()
-    return conversations
+    # Taken before the page, so a write racing with this request can only
+    # make the tag look stale, never fresh
+    validator = (await db.execute(CONVERSATIONS_VALIDATOR, {"current_user_id": current_user.id})).one()
+    etag = make_etag("conversations", current_user.id, tuple(validator), before, limit)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    params = {"current_user_id": current_user.id, "limit": limit + 1}
+    query = CONVERSATIONS_PAGE
+    if before:
+        try:
+            params["cursor_at"], params["cursor_id"] = decode_cursor(before)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = CONVERSATIONS_PAGE_BEFORE
+
+    conversations = (await db.execute(query, params)).scalars().all()
+    has_more = len(conversations) > limit
+    conversations = conversations[:limit]
+    conversation_ids = [conversation.id for conversation in conversations]
+
+    last_messages = {}
+    unread_counts = {}
+    if conversation_ids:
+        latest = _message_items(
+            await db.execute(LAST_MESSAGES, {"conversation_ids": conversation_ids}),
+            {conversation.id: conversation for conversation in conversations}
+        )
+        last_messages = {message["conversation_id"]: message for message in latest}
+
+        # Unread messages sit above the user's watermark: one index range per
+        # conversation. The shape depends on the page size, so this one is
+        # built per request.
+        unread_counts = dict((await db.execute(select(
+            Message.conversation_id, func.count(Message.id)
+        ).where(
+            or_(*(
+                and_(
+                    Message.conversation_id == conversation.id,
+                    Message.id > conversation.last_read_message_id(current_user.id)
+                )
+                for conversation in conversations
+            )),
+            Message.sender_id != current_user.id
+        ).group_by(Message.conversation_id))).all())
+
+    items = [
+        {
+            "id": conversation.id,
+            "user1_id": conversation.user1_id,
+            "user2_id": conversation.user2_id,
+            "participant_id": conversation.other_participant_id(current_user.id),
+            "updated_at": conversation.updated_at or NEVER_UPDATED,
+            "last_message": last_messages.get(conversation.id),
+            "unread_count": unread_counts.get(conversation.id, 0),
+        }
+        for conversation in conversations
+    ]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(conversations[-1].updated_at or NEVER_UPDATED, conversations[-1].id)
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor}, headers=cache_headers(etag))
 
 @router.post("/conversations", response_model=ConversationResponse)
 async def create_conversation(
     conversation: ConversationCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Create a new conversation with another user
     """
     # Check if conversation already exists
-    existing = db.query(Conversation).filter(
+    existing = (await db.execute(select(Conversation).where(
         ((Conversation.user1_id == current_user.id) & (Conversation.user2_id == conversation.participant_id)) |
         ((Conversation.user1_id == conversation.participant_id) & (Conversation.user2_id == current_user.id))
-    ).first()
+    ))).scalars().first()
     
     if existing:
         return existing
@@ -53,146 +267,161 @@ async def create_conversation(
         user2_id=conversation.participant_id
     )
     db.add(db_conversation)
-    db.commit()
-    db.refresh(db_conversation)
+    await db.commit()
+    await db.refresh(db_conversation)
     return db_conversation
 
-@router.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
+@router.get("/conversations/{conversation_id}/messages", response_model=MessagePage)
 async def get_messages(
     conversation_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    before: Optional[str] = Query(None, description="Cursor; return messages older than this position"),
+    after: Optional[str] = Query(None, description="Cursor; return messages newer than this position"),
+    limit: int = Query(50, ge=1, le=200, description="Maximum number of messages to return"),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
-    Get all messages in a conversation
+    Get a page of messages in a conversation, oldest first.
+
+    Without a cursor the most recent page is returned. Pass `prev_cursor` as
+    `before` to page back through history and `next_cursor` as `after` to
+    fetch newer messages.
     """
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        (Conversation.user1_id == current_user.id) |
-        (Conversation.user2_id == current_user.id)
-    ).first()
-    
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    conversation = await _conversation_for_user(db, conversation_id, current_user.id)
     
-    messages = db.query(Message).filter(
-        Message.conversation_id == conversation_id
-    ).order_by(Message.created_at.asc()).all()
+    # Fetch one extra row to learn whether another page exists
+    params = {"conversation_id": conversation_id, "limit": limit + 1}
+    query = MESSAGES_AFTER if after else MESSAGES_BEFORE if before else MESSAGES_LATEST
+    if after or before:
+        try:
+            params["cursor_at"], params["cursor_id"] = decode_cursor(after or before)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    messages = _message_items(await db.execute(query, params), {conversation_id: conversation})
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if not after:
+        messages.reverse()
+
+    has_older = has_more if not after else True
+    has_newer = has_more if after else bool(before)
+
+    next_cursor = prev_cursor = None
+    if messages:
+        if has_older:
+            prev_cursor = encode_cursor(messages[0]["created_at"], messages[0]["id"])
+        if has_newer:
+            next_cursor = encode_cursor(messages[-1]["created_at"], messages[-1]["id"])
     
-    return messages
+    return FastJSONResponse({
+        "items": messages,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor
+    })
 
 @router.post("/conversations/{conversation_id}/messages", response_model=MessageResponse)
 async def send_message(
     conversation_id: int,
     message: MessageCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Send a message in a conversation
     """
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        (Conversation.user1_id == current_user.id) |
-        (Conversation.user2_id == current_user.id)
-    ).first()
+    conversation = await _conversation_for_user(db, conversation_id, current_user.id)
     
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    
-    db_message = Message(
-        conversation_id=conversation_id,
-        sender_id=current_user.id,
-        content=message.content
-    )
-    db.add(db_message)
-    
-    # Update conversation's updated_at timestamp
-    conversation.updated_at = db_message.created_at
-    
-    db.commit()
-    db.refresh(db_message)
+    now = datetime.utcnow()
+    if message_writer is not None:
+        # Group commit: returns once the batch holding this message is stored
+        db_message = await message_writer.submit(conversation_id, current_user.id, message.content, now)
+    else:
+        db_message = Message(
+            conversation_id=conversation_id,
+            sender_id=current_user.id,
+            content=message.content,
+            created_at=now
+        )
+        db.add(db_message)
+
+        # Update conversation's updated_at timestamp
+        conversation.updated_at = now
+
+        # Every column is known once the insert assigns the id; no refresh needed
+        await db.commit()
     
     # Notify other participant through WebSocket
-    recipient_id = conversation.user2_id if conversation.user1_id == current_user.id else conversation.user1_id
+    item = _message_item(db_message, conversation)
     await manager.send_personal_message(
-        recipient_id,
+        conversation.other_participant_id(current_user.id),
         {
             "type": "new_message",
             "conversation_id": conversation_id,
-            "message": db_message.dict()
+            "message": MessageResponse.model_validate(item).model_dump(mode="json")
         }
     )
     
-    return db_message
+    return item
 
 @router.post("/conversations/{conversation_id}/read")
 async def mark_conversation_read(
     conversation_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Mark all messages in a conversation as read
     """
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        (Conversation.user1_id == current_user.id) |
-        (Conversation.user2_id == current_user.id)
-    ).first()
+    conversation = await _conversation_for_user(db, conversation_id, current_user.id)
     
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    # Move the user's watermark up to the latest message: a single-row update
+    mark_read = MARK_READ_AS_USER1 if conversation.user1_id == current_user.id else MARK_READ_AS_USER2
+    await db.execute(mark_read, {"conversation_id": conversation_id})
     
-    # Update all unread messages
-    db.query(Message).filter(
-        Message.conversation_id == conversation_id,
-        Message.sender_id != current_user.id,
-        Message.read == False
-    ).update({"read": True})
-    
-    db.commit()
+    await db.commit()
     return {"message": "Conversation marked as read"}
 
 @router.delete("/conversations/{conversation_id}")
 async def delete_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Delete a conversation and all its messages
     """
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        (Conversation.user1_id == current_user.id) |
-        (Conversation.user2_id == current_user.id)
-    ).first()
-    
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    conversation = await _conversation_for_user(db, conversation_id, current_user.id)
     
     # Delete all messages first
-    db.query(Message).filter(Message.conversation_id == conversation_id).delete()
+    await db.execute(delete(Message).where(Message.conversation_id == conversation_id))
     # Then delete the conversation
-    db.delete(conversation)
-    db.commit()
+    await db.delete(conversation)
+    await db.commit()
     
     return {"message": "Conversation deleted"}
 
 @router.websocket("/ws/messages/{user_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
-    user_id: int,
-    db: Session = Depends(get_db)
+    user_id: int
 ):
     """
     WebSocket endpoint for real-time messaging
     """
     await manager.connect(websocket)
+    user, options = await authenticate_websocket(websocket)
+    if user is None or user.id != user_id:
+        await manager.reject(websocket)
+        return
+
+    manager.add_connection(user_id, websocket, options)
     try:
-        while True:
-            data = await websocket.receive_text()
-            # Handle any incoming messages if needed
-    except WebSocketDisconnect:
+        # Any frame, text or binary and normally a pong, shows the client is still there
+        while await receive_frame(websocket) is not None:
+            manager.received(websocket)
+    finally:
         manager.disconnect(websocket) 
\ No newline at end of file
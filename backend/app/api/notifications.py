@@ -1,93 +1,279 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
-from typing import List
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
+from app.db.warmup import hot_statement
 from app.models import Notification, User
-from app.schemas.notification import NotificationCreate, NotificationResponse
-from app.core.auth import get_current_user
-from app.core.websocket import ConnectionManager
+from app.schemas.notification import (
+    NotificationBulkCreate,
+    NotificationCreate,
+    NotificationPage,
+    NotificationResponse,
+    UnreadCountResponse
+)
+from app.core.auth import CurrentUser, get_current_user
+from app.core.config import settings
+from app.core.conditional import cache_headers, make_etag, not_modified
+from app.core.pagination import decode_cursor, encode_cursor, keyset_before
+from app.core.responses import FastJSONResponse, rows_as_dicts
+from app.core.websocket import ConnectionManager, authenticate_websocket, receive_frame
 from app.core.notification_service import NotificationService
 
 router = APIRouter()
-manager = ConnectionManager()
-notification_service = NotificationService()
+manager = ConnectionManager("notifications")
+notification_service = NotificationService(manager)
 
-@router.get("/notifications", response_model=List[NotificationResponse])
+# The columns of a NotificationResponse, fetched as plain rows for list pages
+NOTIFICATION_FIELDS = (
+    Notification.id,
+    Notification.user_id,
+    Notification.type,
+    Notification.message,
+    Notification.data,
+    Notification.read,
+    Notification.created_at,
+)
+
+# Hot statements, built once with bound parameters and compiled by the
+# startup warmup (see app.api.messages). Parameter names must not clash
+# with the columns an UPDATE sets, hence current_user_id.
+OWN_NOTIFICATION = Notification.user_id == bindparam("current_user_id")
+
+# ETag validator of a user's feed: inserts and deletes move the count or
+# the newest id, and reading moves the unread counter
+NOTIFICATIONS_VALIDATOR = hot_statement(
+    select(
+        func.count(Notification.id),
+        func.max(Notification.id),
+        select(User.unread_notification_count).where(User.id == bindparam("current_user_id")).scalar_subquery()
+    ).where(OWN_NOTIFICATION),
+    current_user_id=0
+)
+
+NOTIFICATIONS_PAGE = hot_statement(
+    select(*NOTIFICATION_FIELDS).where(OWN_NOTIFICATION).order_by(
+        Notification.created_at.desc(), Notification.id.desc()
+    ).limit(bindparam("limit")),
+    current_user_id=0, limit=1
+)
+NOTIFICATIONS_PAGE_BEFORE = hot_statement(
+    NOTIFICATIONS_PAGE.where(keyset_before(
+        Notification.created_at, Notification.id, bindparam("cursor_at"), bindparam("cursor_id")
+    )),
+    current_user_id=0, limit=1, cursor_at=datetime(1970, 1, 1), cursor_id=0
+)
+
+UNREAD_COUNT = hot_statement(
+    select(User.unread_notification_count).where(User.id == bindparam("current_user_id")),
+    current_user_id=0
+)
+
+# Only a notification that is still unread moves the counter
+MARK_READ = hot_statement(
+    update(Notification).where(
+        Notification.id == bindparam("notification_id"),
+        OWN_NOTIFICATION,
+        Notification.read == False
+    ).values(read=True).execution_options(synchronize_session=False),
+    notification_id=0, current_user_id=0
+)
+NOTIFICATION_EXISTS = hot_statement(
+    select(Notification.id).where(Notification.id == bindparam("notification_id"), OWN_NOTIFICATION),
+    notification_id=0, current_user_id=0
+)
+MARK_ALL_READ = hot_statement(
+    update(Notification).where(OWN_NOTIFICATION, Notification.read == False).values(
+        read=True
+    ).execution_options(synchronize_session=False),
+    current_user_id=0
+)
+# Setting updated_at to itself keeps the column's onupdate (and MySQL's ON
+# UPDATE CURRENT_TIMESTAMP) from treating a counter change as a profile edit
+SUBTRACT_UNREAD = hot_statement(
+    update(User).where(User.id == bindparam("current_user_id")).values(
+        unread_notification_count=User.unread_notification_count - bindparam("count"),
+        updated_at=User.updated_at
+    ).execution_options(synchronize_session=False),
+    current_user_id=0, count=0
+)
+
+# Clearing a feed goes in id ranges of NOTIFICATION_PURGE_BATCH_SIZE rows,
+# one short transaction each, like the purger
+CLEAR_CHUNK_IDS = hot_statement(
+    select(Notification.id).where(OWN_NOTIFICATION, Notification.id > bindparam("after_id")).order_by(
+        Notification.id
+    ).limit(bindparam("limit")),
+    current_user_id=0, after_id=0, limit=1
+)
+IN_CLEAR_CHUNK = Notification.id.between(bindparam("first_id"), bindparam("last_id"))
+DELETE_UNREAD_CHUNK = hot_statement(
+    delete(Notification).where(OWN_NOTIFICATION, IN_CLEAR_CHUNK, Notification.read == False).execution_options(
+        synchronize_session=False
+    ),
+    current_user_id=0, first_id=0, last_id=0
+)
+DELETE_CHUNK = hot_statement(
+    delete(Notification).where(OWN_NOTIFICATION, IN_CLEAR_CHUNK).execution_options(synchronize_session=False),
+    current_user_id=0, first_id=0, last_id=0
+)
+
+@router.get("/notifications", response_model=NotificationPage)
 async def get_notifications(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    before: Optional[str] = Query(None, description="Cursor; return notifications older than this position"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of notifications to return"),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Get a page of the current user's notifications, newest first. Pass
+    `next_cursor` as `before` to fetch the next page.
+
+    Responses carry an ETag; a request whose If-None-Match still matches
+    gets a 304 after one aggregate query instead of the page.
+    """
+    # Taken before the page, so a write racing with this request can only
+    # make the tag look stale, never fresh
+    validator = (await db.execute(NOTIFICATIONS_VALIDATOR, {"current_user_id": current_user.id})).one()
+    etag = make_etag("notifications", current_user.id, tuple(validator), before, limit)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    params = {"current_user_id": current_user.id, "limit": limit + 1}
+    query = NOTIFICATIONS_PAGE
+    if before:
+        try:
+            params["cursor_at"], params["cursor_id"] = decode_cursor(before)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = NOTIFICATIONS_PAGE_BEFORE
+
+    notifications = rows_as_dicts(await db.execute(query, params))
+    has_more = len(notifications) > limit
+    notifications = notifications[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = notifications[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return FastJSONResponse({"items": notifications, "next_cursor": next_cursor}, headers=cache_headers(etag))
+
+@router.get("/notifications/unread-count", response_model=UnreadCountResponse)
+async def get_unread_count(
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Get the number of unread notifications, read from the user's counter
+    """
+    count = await db.scalar(UNREAD_COUNT, {"current_user_id": current_user.id})
+    return {"count": count or 0}
+
+@router.post("/notifications/bulk")
+async def create_bulk_notification(
+    notification_in: NotificationBulkCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
-    Get all notifications for the current user
+    Send the same notification to many active users, or to all of them
+    when no user_ids are given. Admins only.
     """
-    notifications = db.query(Notification).filter(
-        Notification.user_id == current_user.id
-    ).order_by(Notification.created_at.desc()).all()
-    return notifications
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    recipients = select(User.id).where(User.is_active == True)
+    if notification_in.user_ids is not None:
+        recipients = recipients.where(User.id.in_(notification_in.user_ids))
+    user_ids = (await db.execute(recipients)).scalars().all()
+
+    count = await notification_service.notify_many(
+        db, user_ids, notification_in.type, notification_in.message, notification_in.data
+    )
+    return {"message": "Notifications sent", "count": count}
 
 @router.post("/notifications/{notification_id}/read")
 async def mark_notification_read(
     notification_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Mark a notification as read
     """
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
-    
-    if not notification:
+    params = {"notification_id": notification_id, "current_user_id": current_user.id}
+    result = await db.execute(MARK_READ, params)
+
+    if result.rowcount:
+        await db.execute(SUBTRACT_UNREAD, {"current_user_id": current_user.id, "count": 1})
+    elif await db.scalar(NOTIFICATION_EXISTS, params) is None:
         raise HTTPException(status_code=404, detail="Notification not found")
-    
-    notification.read = True
-    db.commit()
+
+    await db.commit()
     return {"message": "Notification marked as read"}
 
 @router.post("/notifications/read-all")
 async def mark_all_notifications_read(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Mark all notifications as read
     """
-    db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.read == False
-    ).update({"read": True})
-    db.commit()
+    result = await db.execute(MARK_ALL_READ, {"current_user_id": current_user.id})
+    await db.execute(SUBTRACT_UNREAD, {"current_user_id": current_user.id, "count": result.rowcount})
+    await db.commit()
     return {"message": "All notifications marked as read"}
 
 @router.delete("/notifications")
 async def clear_all_notifications(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
-    Delete all notifications for the current user
+    Delete all notifications for the current user, a chunk of ids per
+    transaction
     """
-    db.query(Notification).filter(
-        Notification.user_id == current_user.id
-    ).delete()
-    db.commit()
+    chunk_size = settings.NOTIFICATION_PURGE_BATCH_SIZE
+    after_id = 0
+    while True:
+        ids = (await db.execute(CLEAR_CHUNK_IDS, {
+            "current_user_id": current_user.id, "after_id": after_id, "limit": chunk_size
+        })).scalars().all()
+        if not ids:
+            break
+        params = {"current_user_id": current_user.id, "first_id": ids[0], "last_id": ids[-1]}
+        unread = await db.execute(DELETE_UNREAD_CHUNK, params)
+        await db.execute(DELETE_CHUNK, params)
+        if unread.rowcount:
+            await db.execute(SUBTRACT_UNREAD, {"current_user_id": current_user.id, "count": unread.rowcount})
+        await db.commit()
+        if len(ids) < chunk_size:
+            break
+        after_id = ids[-1]
     return {"message": "All notifications cleared"}
 
 @router.websocket("/ws/notifications/{user_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
-    user_id: int,
-    db: Session = Depends(get_db)
+    user_id: int
 ):
     """
     WebSocket endpoint for real-time notifications
     """
     await manager.connect(websocket)
+    user, options = await authenticate_websocket(websocket)
+    if user is None or user.id != user_id:
+        await manager.reject(websocket)
+        return
+
+    manager.add_connection(user_id, websocket, options)
     try:
-        while True:
-            data = await websocket.receive_text()
-            # Handle any incoming messages if needed
-    except WebSocketDisconnect:
+        # Any frame, text or binary and normally a pong, shows the client is still there
+        while await receive_frame(websocket) is not None:
+            manager.received(websocket)
+    finally:
         manager.disconnect(websocket) 
\ No newline at end of file
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List
+from app.schemas.presence import PresenceResponse
+from app.core.auth import CurrentUser, get_current_user
+from app.core.presence import presence
+
+router = APIRouter()
+
+# Most ids one presence lookup may ask about
+MAX_PRESENCE_USER_IDS = 200
+
+@router.get("/presence", response_model=List[PresenceResponse])
+async def get_presence(
+    user_ids: List[int] = Query(...),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Report which of the given users have an open websocket. Answered from
+    the in-memory presence registry, without touching the database.
+    """
+    if len(user_ids) > MAX_PRESENCE_USER_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PRESENCE_USER_IDS} user_ids per request")
+    online = presence.online(user_ids)
+    return [{"user_id": user_id, "online": user_id in online} for user_id in dict.fromkeys(user_ids)]
@@ -1,16 +1,114 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
 from typing import List, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session
+import heapq
+from itertools import islice, takewhile
+from sqlalchemy import and_, bindparam, false, or_, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
 from app.models import Research, Event, Resource
-from app.schemas.search import SearchResult
-from app.core.auth import get_current_user
-from app.models.user import User
+from app.schemas.search import SearchPage
+from app.core.auth import CurrentUser, get_current_user
+from app.core.pagination import decode_position, encode_position
+from app.core.responses import dump_json
+from app.core.search_backend import search_backend
+from app.core.search_cache import search_cache
 
 router = APIRouter()
 
-@router.get("/search", response_model=List[SearchResult])
+# Tie-break order between content types when score and date are equal
+TYPE_ORDER = {"research": 0, "event": 1, "resource": 2}
+
+# Content types searched for each value of the `type` filter
+SEARCHED_TYPES = {None: list(TYPE_ORDER), "research": ["research"], "events": ["event"], "resources": ["resource"]}
+
+def _after_position(score_column, date_column, id_column, doc_type: str, position: Optional[dict], sort: str):
+    """
+    Keyset filter for rows that sort strictly after `position` in descending
+    (score, date, type, id) order. Score is skipped when sorting by date.
+    """
+    if position is None:
+        return true()
+
+    type_order, cursor_type_order = TYPE_ORDER[doc_type], TYPE_ORDER[position["k"]]
+    if type_order < cursor_type_order:
+        tail = true()
+    elif type_order > cursor_type_order:
+        tail = false()
+    else:
+        tail = id_column < position["id"]
+
+    cursor_date = datetime.fromisoformat(position["t"])
+    condition = or_(date_column < cursor_date, and_(date_column == cursor_date, tail))
+    if sort == "relevance":
+        condition = or_(score_column < position["s"], and_(score_column == position["s"], condition))
+    return condition
+
+def _sort_key(score: float, date: datetime, doc_type: str, row_id: int, sort: str):
+    key = (date, TYPE_ORDER[doc_type], row_id)
+    return (score,) + key if sort == "relevance" else key
+
+async def _stream(db: AsyncSession, query, doc_type: str, id_column, date_column, q: str,
+                  position: Optional[dict], sort: str, limit: int):
+    """
+    Up to a page and one more of the rows of `query` that match `q` and sort
+    after `position`, in result order, as (sort key, doc type, row, score),
+    together with a frontier: None when the stream is complete up to the
+    last row returned, else the (sort key, doc type, id, score, date) of
+    the last match looked at, beyond which this type was not searched.
+
+    Backends that rank in SQL filter, score and order the query. Otherwise
+    every match is ordered here, with no score cutoff, and only a page's
+    worth of ids at a time is sent to the database, as one IN list. At most
+    `max_candidates` matches after the cursor are looked at per request; a
+    page that runs out of them ends at the frontier instead.
+    """
+    ranked = search_backend.rank(doc_type, q)
+    if ranked is None:
+        match = search_backend.match(doc_type, q)
+        query = query.add_columns(match.score.label("score")).filter(
+            match.condition,
+            _after_position(match.score, date_column, id_column, doc_type, position, sort)
+        ).order_by(
+            *([match.score.desc()] if sort == "relevance" else []),
+            date_column.desc(), id_column.desc()
+        ).limit(limit + 1)
+        return [
+            (_sort_key(row.score, row.date, doc_type, row.id, sort), doc_type, row, row.score)
+            for row in (await db.execute(query)).all()
+        ], None
+
+    candidates = (
+        (_sort_key(score, date or datetime.min, doc_type, doc_id, sort), doc_id, score, date)
+        for doc_id, score, date in ranked
+    )
+    if position is not None:
+        after = _sort_key(position["s"], datetime.fromisoformat(position["t"]), position["k"], position["id"], sort)
+        candidates = (candidate for candidate in candidates if candidate[0] < after)
+    # Selecting the next max_candidates costs O(matches log max_candidates), not a full sort
+    candidates = list(candidates)
+    budget = search_backend.max_candidates
+    selected = heapq.nlargest(budget, candidates)
+
+    # Ids whose rows the other filters reject leave a window short; move on to the next
+    query = query.filter(id_column.in_(bindparam("ids", expanding=True)))
+    stream = []
+    for start in range(0, len(selected), limit + 1):
+        window = selected[start:start + limit + 1]
+        result = await db.execute(query, {"ids": [doc_id for _, doc_id, _, _ in window]})
+        rows = {row.id: row for row in result.all()}
+        stream.extend((key, doc_type, rows[doc_id], score) for key, doc_id, score, _ in window if doc_id in rows)
+        if len(stream) > limit:
+            return stream, None
+    if len(candidates) > budget:
+        key, doc_id, score, date = selected[-1]
+        return stream, (key, doc_type, doc_id, score, date or datetime.min)
+    return stream, None
+
+def _cursor(sort: str, score: float, date: datetime, doc_type: str, row_id: int) -> str:
+    return encode_position({"o": sort, "s": score, "t": date.isoformat(), "k": doc_type, "id": row_id})
+
+@router.get("/search", response_model=SearchPage)
 async def global_search(
     q: str = Query(..., description="Search query"),
     type: Optional[str] = Query(None, description="Content type filter"),
@@ -18,14 +116,52 @@ async def global_search(
     date_range: Optional[List[datetime]] = Query(None, description="Date range filter"),
     resource_type: Optional[List[str]] = Query(None, description="Resource type filter"),
     status: Optional[List[str]] = Query(None, description="Status filter"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    sort: str = Query("relevance", pattern="^(relevance|date)$", description="Order by relevance or date"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of results to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
-    Global search across all content types with advanced filtering
+    Global search across all content types with advanced filtering.
+    Results are ranked by relevance, newest first among equal scores, or by
+    date alone with sort=date.
+
+    Each content type is queried for at most one page of rows in result
+    order, and the sorted streams are merged with a heap, so the work per
+    request depends on the page size rather than on the number of matches.
+    Rankings done in Python are bounded per request instead, see _stream;
+    their pages can come back short, with a cursor to carry on from.
+    Only the columns a SearchResult needs are selected, with author names
+    joined in, so building results never lazy-loads relationships.
+
+    Serialized pages are cached per normalized set of parameters until the
+    content types they cover change.
     """
-    results = []
-    
+    position = None
+    if cursor:
+        try:
+            position = decode_position(cursor)
+            if position.get("o") != sort or position.get("k") not in TYPE_ORDER:
+                raise ValueError("Invalid cursor")
+            datetime.fromisoformat(position["t"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    cache_key = None
+    if search_cache is not None:
+        cache_key = await search_cache.key(
+            SEARCHED_TYPES.get(type or None, []), q, type, era, date_range, resource_type, status, sort, limit, cursor
+        )
+    if cache_key is not None:
+        cached = await search_cache.get(cache_key)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+
+    if not search_backend.ready:
+        await db.run_sync(search_backend.prepare)
+    streams = []
+
     # Base query conditions
     base_conditions = []
     if era:
@@ -37,75 +173,115 @@ async def global_search(
 
     # Search in research projects
     if not type or type == "research":
-        research_query = db.query(Research).filter(
-            Research.title.ilike(f"%{q}%") | Research.description.ilike(f"%{q}%")
-        )
+        LeadResearcher = Research.lead_researcher.mapper.class_
+        research_query = select(
+            Research.id,
+            Research.title,
+            Research.description,
+            Research.start_date.label("date"),
+            Research.era,
+            Research.status,
+            LeadResearcher.name.label("lead_researcher")
+        ).outerjoin(Research.lead_researcher)
         for condition in base_conditions:
             research_query = research_query.filter(condition)
-        
-        for research in research_query.all():
-            results.append(SearchResult(
-                id=research.id,
-                type="research",
-                title=research.title,
-                description=research.description,
-                date=research.start_date,
-                metadata={
-                    "era": research.era,
-                    "status": research.status,
-                    "lead_researcher": research.lead_researcher.name
-                }
-            ))
+
+        streams.append(await _stream(
+            db, research_query, "research", Research.id, Research.start_date, q, position, sort, limit
+        ))
 
     # Search in events
     if not type or type == "events":
-        event_query = db.query(Event).filter(
-            Event.title.ilike(f"%{q}%") | Event.description.ilike(f"%{q}%")
+        event_query = select(
+            Event.id,
+            Event.title,
+            Event.description,
+            Event.date.label("date"),
+            Event.type,
+            Event.status,
+            Event.location
         )
         if date_range and len(date_range) == 2:
             event_query = event_query.filter(Event.date.between(date_range[0], date_range[1]))
         if status:
             event_query = event_query.filter(Event.status.in_(status))
-        
-        for event in event_query.all():
-            results.append(SearchResult(
-                id=event.id,
-                type="event",
-                title=event.title,
-                description=event.description,
-                date=event.date,
-                metadata={
-                    "type": event.type,
-                    "status": event.status,
-                    "location": event.location
-                }
-            ))
+
+        streams.append(await _stream(db, event_query, "event", Event.id, Event.date, q, position, sort, limit))
 
     # Search in resources
     if not type or type == "resources":
-        resource_query = db.query(Resource).filter(
-            Resource.title.ilike(f"%{q}%") | Resource.description.ilike(f"%{q}%")
-        )
+        Author = Resource.author.mapper.class_
+        resource_query = select(
+            Resource.id,
+            Resource.title,
+            Resource.description,
+            Resource.created_at.label("date"),
+            Resource.type,
+            Resource.format,
+            Author.name.label("author")
+        ).outerjoin(Resource.author)
         if resource_type:
             resource_query = resource_query.filter(Resource.type.in_(resource_type))
         if date_range and len(date_range) == 2:
             resource_query = resource_query.filter(Resource.created_at.between(date_range[0], date_range[1]))
-        
-        for resource in resource_query.all():
-            results.append(SearchResult(
-                id=resource.id,
-                type=resource.type,
-                title=resource.title,
-                description=resource.description,
-                date=resource.created_at,
-                metadata={
-                    "type": resource.type,
-                    "format": resource.format,
-                    "author": resource.author.name
-                }
-            ))
-
-    # Sort results by date
-    results.sort(key=lambda x: x.date, reverse=True)
-    
-    return results 
\ No newline at end of file
+
+        streams.append(await _stream(
+            db, resource_query, "resource", Resource.id, Resource.created_at, q, position, sort, limit
+        ))
+
+    # Merge the per-type streams, which are already in result order. Past
+    # the highest frontier some type wasn't searched, so the page ends there.
+    frontier = max((frontier for _, frontier in streams if frontier is not None), default=None)
+    merged = heapq.merge(*(stream for stream, _ in streams), key=lambda item: item[0], reverse=True)
+    if frontier is not None:
+        merged = takewhile(lambda item: item[0] >= frontier[0], merged)
+    page = list(islice(merged, limit + 1))
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    results = []
+    for _, doc_type, row, score in page:
+        if doc_type == "research":
+            result_type = "research"
+            metadata = {
+                "era": row.era,
+                "status": row.status,
+                "lead_researcher": row.lead_researcher
+            }
+        elif doc_type == "event":
+            result_type = "event"
+            metadata = {
+                "type": row.type,
+                "status": row.status,
+                "location": row.location
+            }
+        else:
+            result_type = row.type
+            metadata = {
+                "type": row.type,
+                "format": row.format,
+                "author": row.author
+            }
+        results.append({
+            "id": row.id,
+            "type": result_type,
+            "title": row.title,
+            "description": row.description,
+            "date": row.date,
+            "metadata": metadata,
+            "score": float(score)
+        })
+
+    next_cursor = None
+    if has_more:
+        _, last_type, last_row, last_score = page[-1]
+        next_cursor = _cursor(sort, last_score, last_row.date, last_type, last_row.id)
+    elif frontier is not None:
+        _, frontier_type, frontier_id, frontier_score, frontier_date = frontier
+        next_cursor = _cursor(sort, frontier_score, frontier_date, frontier_type, frontier_id)
+
+    # Rows are trusted database output; encode them without building SearchResults
+    body = dump_json({"items": results, "next_cursor": next_cursor})
+    if cache_key is not None:
+        await search_cache.set(cache_key, body)
+    return Response(content=body, media_type="application/json")
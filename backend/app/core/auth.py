@@ -0,0 +1,263 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.message_bus import MessageBus, message_bus
+from app.db.session import new_session
+from app.models import User
+
+logger = logging.getLogger(__name__)
+
+AUTH_CHANNEL = "auth"
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    The caller's user row as of when their token was verified. Handlers
+    only read these columns, so cached requests never touch the database.
+    """
+    id: int
+    email: str
+    full_name: Optional[str]
+    is_active: bool
+    is_superuser: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            is_active=bool(user.is_active),
+            is_superuser=bool(user.is_superuser)
+        )
+
+
+# Changes to these columns drop the user's cached tokens
+INVALIDATING_COLUMNS = ("hashed_password", "is_active", "is_superuser", "email", "full_name")
+
+
+class TokenCache:
+    """
+    LRU cache of verified tokens, keyed by the token's SHA-256 digest, each
+    holding the decoded claims and a CurrentUser. Entries live for `ttl`
+    seconds or until the token expires, whichever comes first.
+
+    Entries for a user are dropped when a transaction that changed their
+    password, active flag or profile commits; ORM changes are tracked
+    automatically, Core statements register theirs with
+    invalidate_on_commit(). The invalidation is also published on the
+    message bus so every worker drops them; workers that miss it catch up
+    when the TTL runs out.
+
+    Every invalidation also bumps the user's generation. A request that
+    missed the cache reads the generation before loading the user and
+    passes it to set(), which refuses the entry if an invalidation ran in
+    between: the row it loaded may predate the committed change.
+    """
+
+    def __init__(self, bus: MessageBus, ttl: float, max_entries: int):
+        self.bus = bus
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # digest -> (expires_at, claims, user)
+        self.entries: "OrderedDict[str, Tuple[float, dict, CurrentUser]]" = OrderedDict()
+        # user_id -> digests of that user's cached tokens
+        self.by_user: Dict[int, Set[str]] = {}
+        # user_id -> invalidations seen so far, for users invalidated at least once
+        self.generations: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.pending: Set[asyncio.Task] = set()
+        bus.subscribe(AUTH_CHANNEL, self._receive)
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Tuple[dict, CurrentUser]]:
+        key = self.digest(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def generation(self, user_id: int) -> int:
+        with self.lock:
+            return self.generations.get(user_id, 0)
+
+    def set(self, token: str, claims: dict, user: CurrentUser, generation: Optional[int] = None):
+        """
+        Cache a verified token. `generation` is the user's generation read
+        before `user` was loaded; the entry is dropped if it has moved on.
+        """
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl
+        if "exp" in claims:
+            ttl = min(ttl, claims["exp"] - time.time())
+        if ttl <= 0:
+            return
+        key = self.digest(token)
+        with self.lock:
+            if generation is not None and generation != self.generations.get(user.id, 0):
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + ttl, claims, user)
+            self.by_user.setdefault(user.id, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate_user(self, user_id: int):
+        """
+        Drop the user's tokens here and on every other worker. Safe to call
+        from any thread.
+        """
+        self._drop(user_id)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._publish, {"user_id": user_id})
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_user.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        self.loop = None
+
+    def _drop(self, user_id: int):
+        with self.lock:
+            self.generations[user_id] = self.generations.get(user_id, 0) + 1
+            for key in list(self.by_user.get(user_id, ())):
+                self._remove(key)
+
+    def _remove(self, key: str):
+        _, _, user = self.entries.pop(key)
+        keys = self.by_user.get(user.id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_user[user.id]
+
+    def _publish(self, payload: dict):
+        task = asyncio.get_running_loop().create_task(self.bus.publish(AUTH_CHANNEL, payload))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    def _receive(self, payload: dict):
+        self._drop(payload["user_id"])
+
+
+token_cache = TokenCache(message_bus, settings.AUTH_CACHE_TTL, settings.AUTH_CACHE_MAX_ENTRIES)
+
+# session.info key of the user ids to invalidate when the session commits
+PENDING_INVALIDATIONS = "token_cache_user_ids"
+
+
+def invalidate_on_commit(session, user_ids: Iterable[int]):
+    """
+    Drop the users' cached tokens once the session's transaction commits.
+    Needed by Core update(User)/delete(User) statements that change
+    INVALIDATING_COLUMNS; ORM changes are registered by the hooks below.
+    Takes a Session, an AsyncSession or a ThreadedSession.
+    """
+    session = getattr(session, "sync_session", session)
+    session.info.setdefault(PENDING_INVALIDATIONS, set()).update(user_ids)
+
+
+# The mapper hooks run during flush, before the transaction is committed:
+# dropping entries there would let a concurrent request cache the old row
+# again, or drop them for a change that is then rolled back
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target: User):
+    state = inspect(target)
+    if any(state.attrs[column].history.has_changes() for column in INVALIDATING_COLUMNS):
+        invalidate_on_commit(state.session, [target.id])
+
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target: User):
+    invalidate_on_commit(inspect(target).session, [target.id])
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    for user_id in session.info.pop(PENDING_INVALIDATIONS, ()):
+        token_cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_invalidations(session, previous_transaction):
+    session.info.pop(PENDING_INVALIDATIONS, None)
+
+
+async def authenticate_token(token: str) -> Optional[CurrentUser]:
+    """
+    The active user a JWT identifies, or None. Warm tokens are answered from
+    the cache without verifying the signature again or loading the user.
+    """
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached[1]
+
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        user_id = int(claims["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+
+    # Read first: an invalidation committed while the row loads makes it stale
+    generation = token_cache.generation(user_id)
+    db = new_session()
+    try:
+        user = await db.get(User, user_id)
+    finally:
+        await db.close()
+    if user is None or not user.is_active:
+        return None
+
+    current_user = CurrentUser.from_user(user)
+    token_cache.set(token, claims, current_user, generation)
+    return current_user
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> CurrentUser:
+    user = await authenticate_token(token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return user
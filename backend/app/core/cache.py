@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+
+class MemoryCache:
+    """
+    In-process LRU cache of byte values with a TTL, an entry limit and a
+    memory ceiling. Also holds integer counters, which never expire.
+    """
+
+    # Calls never wait on I/O and have no failure modes worth catching
+    blocking = False
+    errors: Tuple[type, ...] = ()
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self.counters = {}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.total_bytes += len(value)
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def incr(self, key: str) -> int:
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            return self.counters[key]
+
+    def get_counter(self, key: str) -> int:
+        return self.counters.get(key, 0)
+
+    def get_counters(self, keys: Iterable[str]) -> List[int]:
+        return [self.counters.get(key, 0) for key in keys]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def _remove(self, key: str):
+        _, value = self.entries.pop(key)
+        self.total_bytes -= len(value)
+
+
+class RedisCache:
+    """
+    Cache shared between workers, stored in Redis. Memory limits and LRU
+    eviction are left to the server's maxmemory policy.
+
+    The client is synchronous, since counters are also bumped from commit
+    hooks: async callers run its methods in the threadpool (`blocking`) and
+    treat `errors` as the cache being unavailable.
+    """
+
+    blocking = True
+
+    def __init__(self, url: str, ttl: float, prefix: str, timeout: float):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("The redis package is required for the redis cache backend") from exc
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.errors = (redis.RedisError,)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes):
+        self.client.set(self.prefix + key, value, px=int(self.ttl * 1000))
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(self.prefix + "counter:" + key)
+
+    def get_counter(self, key: str) -> int:
+        return int(self.client.get(self.prefix + "counter:" + key) or 0)
+
+    def get_counters(self, keys: Iterable[str]) -> List[int]:
+        # One round trip for every counter a key depends on
+        values = self.client.mget([self.prefix + "counter:" + key for key in keys])
+        return [int(value or 0) for value in values]
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            if not key.startswith((self.prefix + "counter:").encode()):
+                self.client.delete(key)
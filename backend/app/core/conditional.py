@@ -0,0 +1,43 @@
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+# Per-user pages: browsers may keep them but must revalidate every time, and
+# shared caches must not hand one user's page to another
+CACHE_CONTROL = "private, no-cache"
+VARY = "Authorization"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Weak entity tag over the values that determine a response body: the
+    caller, the query parameters and a cheap validator of the data (counts,
+    latest timestamps) that changes whenever the page could
+    """
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+    return f'W/"{digest}"'
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": VARY}
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    A 304 response if the request's If-None-Match already names `etag`,
+    otherwise None
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = {_opaque_tag(tag) for tag in header.split(",")}
+    if "*" in candidates or _opaque_tag(etag) in candidates:
+        return Response(status_code=304, headers=cache_headers(etag))
+    return None
+
+
+def _opaque_tag(tag: str) -> str:
+    # Weak comparison: W/ prefixes are ignored on both sides
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
@@ -32,6 +32,21 @@ class Settings(BaseSettings):
     DB_NAME: str = "gulf_south_platform"
     DATABASE_URL: Optional[str] = None
     SQLALCHEMY_DATABASE_URI: Optional[str] = None
+    DB_ENGINE_MODE: str = "sync"  # sync (threadpool) or async (aiomysql/aiosqlite)
+    SQL_STATS_ENABLED: bool = True  # Per-request query counts and the slow-query log
+    SQL_SLOW_QUERY_THRESHOLD: float = 0.2  # Seconds; slower statements are logged to app.sql.slow
+    SQL_SLOW_REQUEST_THRESHOLD: float = 1.0  # Seconds; slower requests log their query stats at INFO, others at DEBUG
+    SQL_STATS_HEADER: bool = False  # Send the stats to clients in a Server-Timing header; for development only
+    DB_POOL_SIZE: int = 5  # Connections kept open per engine, in each worker process
+    DB_MAX_OVERFLOW: int = 10  # Extra connections opened under load, closed when returned
+    DB_POOL_TIMEOUT: float = 10.0  # Seconds to wait for a free connection before failing
+    DB_POOL_RECYCLE: int = 3600  # Seconds before a connection is replaced (server-side databases)
+    DB_POOL_STATS_INTERVAL: float = 60.0  # Seconds between pool metric logs, 0 disables the monitor
+    DB_POOL_ADAPTIVE: bool = False  # Let the monitor raise or lower the connection limit from checkout waits
+    DB_POOL_MAX_SIZE: int = 30  # Highest connection limit adaptive mode may set, per engine and worker
+    DB_POOL_TARGET_WAIT: float = 0.01  # Seconds; p95 checkout wait above which adaptive mode grows the pool
+    DB_WARMUP: bool = True  # At startup, configure mappers, open pool connections and compile hot statements
+    DB_WARMUP_CONNECTIONS: int = 4  # Connections the warmup opens per engine, at most DB_POOL_SIZE
 
     @validator("SQLALCHEMY_DATABASE_URI", pre=True)
     def assemble_db_uri(cls, v: Optional[str], values: dict) -> str:
@@ -45,11 +60,56 @@ class Settings(BaseSettings):
             f"sqlite:///./app.db"
         )
 
+    # Search
+    SEARCH_BACKEND: str = "auto"  # auto, mysql, inverted or like
+    SEARCH_INDEX_PATH: Optional[str] = "./search_index.json"
+    SEARCH_MAX_CANDIDATES: int = 1000  # Inverted index matches per type one request may page through
+    SEARCH_INDEX_SAVE_INTERVAL: float = 30.0  # Seconds between index snapshots to disk
+    SEARCH_CACHE_BACKEND: str = "auto"  # auto (redis if REDIS_URL is set, else memory), memory, redis or none
+    SEARCH_CACHE_TTL: float = 60.0  # Seconds
+    SEARCH_CACHE_MAX_ENTRIES: int = 1024
+    SEARCH_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    SEARCH_CACHE_TIMEOUT: float = 0.5  # Seconds to wait on Redis before searching uncached
+
+    # WebSockets
+    WS_SEND_QUEUE_SIZE: int = 100  # Pending outbound messages per connection
+    WS_SLOW_CONSUMER_POLICY: str = "drop_oldest"  # drop_oldest, coalesce or disconnect
+    WS_SEND_TIMEOUT: float = 10.0  # Seconds before a stuck send closes the socket
+    WS_AUTH_TIMEOUT: float = 10.0  # Seconds a new socket has to send its auth message
+    WS_PING_INTERVAL: float = 25.0  # Seconds between server pings
+    WS_MAX_MISSED_PONGS: int = 2  # Pings left unanswered before a socket is evicted
+    WS_BATCH_MAX_EVENTS: int = 50  # Events per frame for clients that opt into batching
+    WS_BATCH_MAX_DELAY: float = 0.01  # Seconds a batch waits to fill before it is sent
+    MESSAGE_BUS_BACKEND: str = "memory"  # memory (single worker), sqlite or redis
+    MESSAGE_BUS_SQLITE_PATH: str = "./message_bus.db"
+    MESSAGE_BUS_POLL_INTERVAL: float = 0.05  # Seconds, sqlite backend only
+
+    # Messages
+    MESSAGE_GROUP_COMMIT: bool = False  # Batch concurrent send_message writes into shared commits
+    MESSAGE_GROUP_COMMIT_MAX_BATCH: int = 100  # Messages per commit
+    MESSAGE_GROUP_COMMIT_MAX_DELAY: float = 0.005  # Seconds a message waits for its batch to fill
+
+    # Notifications
+    NOTIFICATION_INSERT_CHUNK_SIZE: int = 1000  # Rows per INSERT when notifying many users
+    # Retention deletes rows for good, so it is opt-in: set a rule and an interval
+    NOTIFICATION_MAX_AGE_DAYS: Optional[int] = None  # e.g. 180; None keeps notifications forever
+    NOTIFICATION_MAX_READ_PER_USER: Optional[int] = None  # e.g. 500 newest read notifications kept per user
+    NOTIFICATION_PURGE_INTERVAL: float = 0  # Seconds between purges, e.g. 3600; 0 disables the purger
+    NOTIFICATION_PURGE_BATCH_SIZE: int = 500  # Rows deleted per transaction
+    NOTIFICATION_PURGE_BATCH_DELAY: float = 0.2  # Seconds between batches
+    NOTIFICATION_ARCHIVE: str = "none"  # none, table or ndjson
+    NOTIFICATION_ARCHIVE_PATH: str = "./notification_archive"  # Directory for ndjson archives
+
+    # Redis, for state shared between workers
+    REDIS_URL: Optional[str] = None
+
     # JWT
     JWT_SECRET: str = "your-secret-key-here"
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+    AUTH_CACHE_TTL: float = 60.0  # Seconds a verified token and its user stay cached
+    AUTH_CACHE_MAX_ENTRIES: int = 10000  # Cached tokens per worker, 0 disables the cache
 
     class Config:
         case_sensitive = True
@@ -0,0 +1,44 @@
+from fastapi import FastAPI
+
+from app.core.auth import token_cache
+from app.core.config import settings
+from app.core.message_bus import message_bus
+from app.core.message_writer import message_writer
+from app.core.notification_purger import notification_purger
+from app.core.presence import presence as presence_registry
+from app.db.session import pool_monitor
+from app.db.warmup import warm_up
+
+
+def register_lifecycle(app: FastAPI):
+    """
+    Add the startup and shutdown hooks of the API's background services
+    to `app`: the database warmup, message bus, token cache, pool monitor,
+    presence snapshots, notification purger and message writer. app.main,
+    the test client and the API benchmark all start the app through here.
+    """
+
+    @app.on_event("startup")
+    async def warm_up_database():
+        # Before traffic: the first requests would otherwise pay for mapper
+        # configuration, pool connects and statement compilation
+        if settings.DB_WARMUP:
+            await warm_up()
+
+    @app.on_event("startup")
+    async def start_realtime():
+        await message_bus.start()
+        await token_cache.start()
+        await pool_monitor.start()
+        await presence_registry.start()
+        await notification_purger.start()
+
+    @app.on_event("shutdown")
+    async def stop_realtime():
+        if message_writer is not None:
+            await message_writer.stop()
+        await notification_purger.stop()
+        await presence_registry.stop()
+        await token_cache.stop()
+        await pool_monitor.stop()
+        await message_bus.stop()
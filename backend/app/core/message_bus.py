@@ -0,0 +1,220 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from contextlib import closing
+from typing import Callable, Dict, List
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], None]
+
+
+class MessageBus:
+    """
+    Publish/subscribe channel between workers. Every worker subscribes to the
+    same channels and delivers what it receives to its own local sockets, so
+    a publish from any worker reaches recipients connected to any other.
+    """
+
+    def __init__(self):
+        self.handlers: Dict[str, List[Handler]] = {}
+
+    def subscribe(self, channel: str, handler: Handler):
+        self.handlers.setdefault(channel, []).append(handler)
+
+    def dispatch(self, channel: str, payload: dict):
+        for handler in self.handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("Message bus handler failed on channel %s", channel)
+
+    async def publish(self, channel: str, payload: dict):
+        raise NotImplementedError
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class InProcessMessageBus(MessageBus):
+    """
+    Delivers publishes straight to local subscribers; for single-worker mode
+    """
+
+    async def publish(self, channel: str, payload: dict):
+        self.dispatch(channel, payload)
+
+
+class SQLiteMessageBus(MessageBus):
+    """
+    Shares publishes between processes on one host through a SQLite table
+    that every worker polls. Meant for tests and local multi-worker runs.
+    """
+
+    def __init__(self, path: str, poll_interval: float, retention: float = 60.0):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.last_id = 0
+        self.poller = None
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _setup(self) -> int:
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS bus_messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+                "payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            return connection.execute("SELECT COALESCE(MAX(id), 0) FROM bus_messages").fetchone()[0]
+
+    def _insert(self, channel: str, data: str):
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO bus_messages (channel, payload, created_at) VALUES (?, ?, ?)",
+                (channel, data, time.time())
+            )
+
+    def _fetch(self, last_id: int):
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM bus_messages WHERE created_at < ?", (time.time() - self.retention,))
+            return connection.execute(
+                "SELECT id, channel, payload FROM bus_messages WHERE id > ? ORDER BY id", (last_id,)
+            ).fetchall()
+
+    async def start(self):
+        if self.poller is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self.last_id = await loop.run_in_executor(None, self._setup)
+        self.poller = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self.poller is not None:
+            self.poller.cancel()
+            self.poller = None
+
+    async def publish(self, channel: str, payload: dict):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._insert, channel, json.dumps(payload))
+
+    async def _poll(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                rows = await loop.run_in_executor(None, self._fetch, self.last_id)
+            except sqlite3.Error:
+                logger.exception("Message bus poll failed")
+                rows = []
+            for row_id, channel, data in rows:
+                self.last_id = row_id
+                self.dispatch(channel, json.loads(data))
+            await asyncio.sleep(self.poll_interval)
+
+
+class RedisMessageBus(MessageBus):
+    """
+    Redis PUBLISH/PSUBSCRIBE; works with any server speaking the Redis protocol.
+
+    The reader outlives the connection: when it drops, the error is logged
+    and the bus subscribes again, backing off from `reconnect_delay` up to
+    `max_reconnect_delay` seconds. Publishes made while it is away are lost,
+    as with any Redis pub/sub client.
+    """
+
+    reconnect_delay = 0.1
+    max_reconnect_delay = 10.0
+
+    def __init__(self, url: str, prefix: str):
+        super().__init__()
+        try:
+            import redis
+            from redis import asyncio as aioredis
+        except ImportError as exc:
+            raise RuntimeError("The redis package is required for the redis message bus") from exc
+        self.client = aioredis.Redis.from_url(url)
+        self.errors = (redis.RedisError, OSError)
+        self.prefix = prefix
+        self.pubsub = None
+        self.reader = None
+
+    async def start(self):
+        if self.reader is not None:
+            return
+        await self._subscribe()
+        self.reader = asyncio.create_task(self._read())
+
+    async def stop(self):
+        if self.reader is not None:
+            self.reader.cancel()
+            self.reader = None
+        await self._unsubscribe()
+
+    async def publish(self, channel: str, payload: dict):
+        await self.client.publish(f"{self.prefix}{channel}", json.dumps(payload))
+
+    async def _subscribe(self):
+        self.pubsub = self.client.pubsub()
+        await self.pubsub.psubscribe(f"{self.prefix}*")
+
+    async def _unsubscribe(self):
+        pubsub, self.pubsub = self.pubsub, None
+        if pubsub is not None:
+            try:
+                await pubsub.close()
+            except self.errors:
+                pass
+
+    async def _read(self):
+        delay = self.reconnect_delay
+        while True:
+            try:
+                if self.pubsub is None:
+                    await self._subscribe()
+                    logger.info("Message bus resubscribed")
+                async for message in self.pubsub.listen():
+                    delay = self.reconnect_delay
+                    self._receive(message)
+                logger.warning("Message bus subscription ended")
+            except self.errors:
+                logger.warning("Message bus connection lost; retrying in %.1f s", delay, exc_info=True)
+            await self._unsubscribe()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _receive(self, message: dict):
+        if message["type"] != "pmessage":
+            return
+        try:
+            channel = message["channel"].decode()[len(self.prefix):]
+            payload = json.loads(message["data"])
+        except (ValueError, TypeError, AttributeError):
+            logger.exception("Dropping malformed message bus payload")
+            return
+        self.dispatch(channel, payload)
+
+
+def create_message_bus() -> MessageBus:
+    name = settings.MESSAGE_BUS_BACKEND
+    if name == "memory":
+        return InProcessMessageBus()
+    if name == "sqlite":
+        return SQLiteMessageBus(settings.MESSAGE_BUS_SQLITE_PATH, settings.MESSAGE_BUS_POLL_INTERVAL)
+    if name == "redis":
+        return RedisMessageBus(settings.REDIS_URL, prefix="gsp:ws:")
+    raise ValueError(f"Unknown message bus backend: {name}")
+
+
+message_bus = create_message_bus()
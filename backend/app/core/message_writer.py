@@ -0,0 +1,172 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.db.session import AnySession, new_session
+from app.models import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+    """
+    Write-behind queue for new messages. Messages submitted within
+    `max_delay` of each other, up to `max_batch` of them, are inserted and
+    committed in one transaction, so a burst pays for one commit (and one
+    fsync) instead of one per message. Each submitter resumes once its
+    batch has committed, with the stored Message.
+
+    A batch that fails is retried one message at a time, so only the
+    submitters whose own message can't be written get the error.
+    """
+
+    def __init__(
+        self,
+        max_batch: int,
+        max_delay: float,
+        session_factory: Callable[[], AnySession] = new_session
+    ):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.session_factory = session_factory
+        self.pending: List[Tuple[Message, asyncio.Future]] = []
+        self.wakeup: Optional[asyncio.Event] = None
+        self.batch_full: Optional[asyncio.Event] = None
+        self.flusher = None
+        self.stopping = False
+
+    @staticmethod
+    def _message(conversation_id: int, sender_id: int, content: str, created_at: datetime) -> Message:
+        return Message(
+            conversation_id=conversation_id,
+            sender_id=sender_id,
+            content=content,
+            read=False,
+            created_at=created_at
+        )
+
+    async def submit(self, conversation_id: int, sender_id: int, content: str, created_at: datetime) -> Message:
+        if self.stopping:
+            raise RuntimeError("Message writer stopped")
+        if self.flusher is None:
+            self.wakeup = asyncio.Event()
+            self.batch_full = asyncio.Event()
+            self.flusher = asyncio.create_task(self._flush_forever())
+        message = self._message(conversation_id, sender_id, content, created_at)
+        committed = asyncio.get_running_loop().create_future()
+        self.pending.append((message, committed))
+        self.wakeup.set()
+        if len(self.pending) >= self.max_batch:
+            self.batch_full.set()
+        return await committed
+
+    async def stop(self):
+        """
+        Write everything already submitted, then stop the flusher
+        """
+        if self.flusher is not None:
+            self.stopping = True
+            # Flush what is queued now rather than after max_delay
+            self.wakeup.set()
+            self.batch_full.set()
+            try:
+                await asyncio.wait([self.flusher])
+            finally:
+                self.flusher = None
+                self.stopping = False
+        # Only left if the flusher was cancelled before it had drained the queue
+        for _, committed in self.pending:
+            if not committed.done():
+                committed.set_exception(RuntimeError("Message writer stopped"))
+        self.pending = []
+
+    async def _flush_forever(self):
+        while True:
+            await self.wakeup.wait()
+            if len(self.pending) < self.max_batch and not self.stopping:
+                # Wait for the batch to fill, or for max_delay to pass
+                timer = asyncio.get_running_loop().call_later(self.max_delay, self.batch_full.set)
+                try:
+                    await self.batch_full.wait()
+                finally:
+                    timer.cancel()
+            batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+            if not self.pending:
+                self.wakeup.clear()
+            if len(self.pending) < self.max_batch:
+                self.batch_full.clear()
+            if batch:
+                try:
+                    await self._flush(batch)
+                except Exception as exc:
+                    # Whatever went wrong, fail this batch and keep serving the next
+                    logger.exception("Failed to flush a batch of %d messages", len(batch))
+                    self._fail(batch, exc)
+            if self.stopping and not self.pending:
+                return
+
+    async def _flush(self, batch: List[Tuple[Message, asyncio.Future]]):
+        try:
+            await self._write([message for message, _ in batch])
+        except Exception as exc:
+            if len(batch) == 1:
+                logger.exception("Failed to write a message")
+                self._fail(batch, exc)
+                return
+            logger.exception("Failed to write a batch of %d messages, retrying them one at a time", len(batch))
+            for message, committed in batch:
+                # A fresh instance: the rolled-back one may carry state from the failed flush
+                retry = self._message(message.conversation_id, message.sender_id, message.content, message.created_at)
+                await self._flush([(retry, committed)])
+            return
+
+        for message, committed in batch:
+            if not committed.done():
+                committed.set_result(message)
+
+    async def _write(self, messages: List[Message]):
+        """
+        Insert the messages and move their conversations' updated_at, in one
+        transaction
+        """
+        # Latest message time per conversation, for its updated_at
+        touched = {}
+        for message in messages:
+            latest = touched.get(message.conversation_id)
+            if latest is None or message.created_at > latest:
+                touched[message.conversation_id] = message.created_at
+
+        db = self.session_factory()
+        try:
+            db.add_all(messages)
+            for conversation_id, updated_at in touched.items():
+                await db.execute(
+                    update(Conversation).where(Conversation.id == conversation_id).values(updated_at=updated_at)
+                )
+            await db.commit()
+        finally:
+            # Rolls back if the commit didn't happen. Failing to close must
+            # not fail messages that are already committed.
+            try:
+                await db.close()
+            except Exception:
+                logger.exception("Failed to close the message writer's session")
+
+    @staticmethod
+    def _fail(batch: List[Tuple[Message, asyncio.Future]], exc: BaseException):
+        for _, committed in batch:
+            if not committed.done():
+                committed.set_exception(exc)
+
+
+def create_message_writer() -> Optional[GroupCommitWriter]:
+    if not settings.MESSAGE_GROUP_COMMIT:
+        return None
+    return GroupCommitWriter(settings.MESSAGE_GROUP_COMMIT_MAX_BATCH, settings.MESSAGE_GROUP_COMMIT_MAX_DELAY)
+
+
+message_writer = create_message_writer()
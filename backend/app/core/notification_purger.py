@@ -0,0 +1,214 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.models import Notification, NotificationArchive, User
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_COLUMNS = (
+    Notification.id,
+    Notification.user_id,
+    Notification.type,
+    Notification.message,
+    Notification.data,
+    Notification.read,
+    Notification.created_at,
+)
+
+
+class NotificationPurger:
+    """
+    Enforces notification retention: deletes notifications older than
+    `max_age` and read notifications beyond the newest `max_read` per user.
+
+    Rows go in primary-key order, `batch_size` per short transaction with a
+    pause between batches, so no single DELETE holds locks for long. Batches
+    are claimed with FOR UPDATE SKIP LOCKED where the database supports it,
+    letting several workers run the purger at once. Deleted rows are
+    optionally archived to the notifications_archive table (in the same
+    transaction) or to one gzipped NDJSON file per batch, which is moved
+    into place only after the batch's DELETE has committed.
+    """
+
+    def __init__(
+        self,
+        max_age: Optional[timedelta],
+        max_read: Optional[int],
+        interval: float,
+        batch_size: int,
+        batch_delay: float,
+        archive: str = "none",
+        archive_path: Optional[str] = None
+    ):
+        if archive not in ("none", "table", "ndjson"):
+            raise ValueError(f"Unknown notification archive: {archive}")
+        self.max_age = max_age
+        self.max_read = max_read
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.archive = archive
+        self.archive_path = archive_path
+        self.runner = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0 and (self.max_age is not None or self.max_read is not None)
+
+    async def start(self):
+        if self.runner is None and self.enabled:
+            self.runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.runner is not None:
+            self.runner.cancel()
+            self.runner = None
+
+    async def _run(self):
+        while True:
+            try:
+                deleted = await self.purge()
+                if deleted:
+                    logger.info("Purged %d notifications", deleted)
+            except Exception:
+                logger.exception("Notification purge failed")
+            await asyncio.sleep(self.interval)
+
+    async def purge(self) -> int:
+        """
+        Apply both retention rules once; returns the number of rows deleted
+        """
+        deleted = 0
+        if self.max_age is not None:
+            cutoff = datetime.utcnow() - self.max_age
+            after_id = 0
+            while True:
+                count, after_id = await run_in_threadpool(self._purge_expired_batch, cutoff, after_id)
+                deleted += count
+                if after_id is None:
+                    break
+                await asyncio.sleep(self.batch_delay)
+
+        if self.max_read is not None:
+            for user_id in await run_in_threadpool(self._users_over_read_limit):
+                while True:
+                    count = await run_in_threadpool(self._purge_read_batch, user_id)
+                    deleted += count
+                    if count < self.batch_size:
+                        break
+                    await asyncio.sleep(self.batch_delay)
+        return deleted
+
+    def _purge_expired_batch(self, cutoff: datetime, after_id: int) -> Tuple[int, Optional[int]]:
+        # Returns rows deleted and the id to continue after, or None when done
+        with SessionLocal() as db:
+            rows = db.execute(select(*NOTIFICATION_COLUMNS).where(
+                Notification.id > after_id,
+                Notification.created_at < cutoff
+            ).order_by(Notification.id).limit(self.batch_size).with_for_update(skip_locked=True)).all()
+            self._commit(db, rows)
+        if len(rows) < self.batch_size:
+            return len(rows), None
+        return len(rows), rows[-1].id
+
+    def _users_over_read_limit(self) -> List[int]:
+        with SessionLocal() as db:
+            return db.execute(select(Notification.user_id).where(
+                Notification.read == True
+            ).group_by(Notification.user_id).having(func.count(Notification.id) > self.max_read)).scalars().all()
+
+    def _purge_read_batch(self, user_id: int) -> int:
+        with SessionLocal() as db:
+            # Everything past the newest max_read read notifications, oldest first
+            surplus = select(Notification.id).where(
+                Notification.user_id == user_id,
+                Notification.read == True
+            ).order_by(Notification.created_at.desc(), Notification.id.desc()).offset(self.max_read)
+            ids = sorted(db.execute(surplus.limit(self.batch_size)).scalars().all())
+            if not ids:
+                return 0
+            rows = db.execute(select(*NOTIFICATION_COLUMNS).where(
+                Notification.id.in_(ids)
+            ).order_by(Notification.id).with_for_update(skip_locked=True)).all()
+            self._commit(db, rows)
+        return len(rows)
+
+    def _commit(self, db: Session, rows: List[Row]):
+        # The NDJSON archive is staged in a temp file and renamed into place
+        # after the commit, so a batch that rolls back and is claimed again
+        # is never archived twice
+        staged = self._stage_ndjson(rows) if self.archive == "ndjson" and rows else None
+        try:
+            self._delete(db, rows)
+            db.commit()
+        except BaseException:
+            if staged is not None:
+                os.remove(staged)
+            raise
+        if staged is not None:
+            os.replace(staged, staged[:-len(".tmp")])
+
+    def _delete(self, db: Session, rows: List[Row]):
+        if not rows:
+            return
+        ids = [row.id for row in rows]
+        if self.archive == "table":
+            db.execute(insert(NotificationArchive).from_select(
+                [column.key for column in NOTIFICATION_COLUMNS],
+                select(*NOTIFICATION_COLUMNS).where(Notification.id.in_(ids))
+            ))
+
+        db.execute(delete(Notification).where(Notification.id.in_(ids)))
+
+        # Keep unread counters in step with the unread rows that went away
+        unread = {}
+        for row in rows:
+            if not row.read:
+                unread[row.user_id] = unread.get(row.user_id, 0) + 1
+        if unread:
+            db.execute(update(User).where(User.id.in_(unread)).values(
+                unread_notification_count=User.unread_notification_count - case(unread, value=User.id, else_=0),
+                updated_at=User.updated_at
+            ))
+
+    def _stage_ndjson(self, rows: List[Row]) -> str:
+        # One file per batch, named after its first id: ids are never reused
+        os.makedirs(self.archive_path, exist_ok=True)
+        path = os.path.join(
+            self.archive_path,
+            f"notifications-{datetime.utcnow():%Y-%m-%d}-{rows[0].id}.ndjson.gz.tmp"
+        )
+        with gzip.open(path, "wt", encoding="utf-8") as archive:
+            for row in rows:
+                record = row._asdict()
+                record["created_at"] = record["created_at"].isoformat() if record["created_at"] else None
+                archive.write(json.dumps(record) + "\n")
+        return path
+
+
+def create_notification_purger() -> NotificationPurger:
+    max_age = settings.NOTIFICATION_MAX_AGE_DAYS
+    return NotificationPurger(
+        timedelta(days=max_age) if max_age is not None else None,
+        settings.NOTIFICATION_MAX_READ_PER_USER,
+        settings.NOTIFICATION_PURGE_INTERVAL,
+        settings.NOTIFICATION_PURGE_BATCH_SIZE,
+        settings.NOTIFICATION_PURGE_BATCH_DELAY,
+        archive=settings.NOTIFICATION_ARCHIVE,
+        archive_path=settings.NOTIFICATION_ARCHIVE_PATH
+    )
+
+
+notification_purger = create_notification_purger()
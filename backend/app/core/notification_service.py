@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import insert, update
+
+from app.core.config import settings
+from app.core.presence import presence
+from app.core.websocket import ConnectionManager
+from app.db.session import AnySession
+from app.models import Notification, User
+
+logger = logging.getLogger(__name__)
+
+
+def _push_payload(notification_id: Optional[int], type: str, message: str, data: Optional[Dict[str, Any]]) -> dict:
+    return {
+        "type": "notification",
+        "data": {"id": notification_id, "type": type, "message": message, "data": data},
+    }
+
+
+class NotificationService:
+    """
+    Stores notifications and pushes them to the recipients' websockets
+    """
+
+    def __init__(self, manager: ConnectionManager, chunk_size: Optional[int] = None):
+        self.manager = manager
+        self.chunk_size = chunk_size or settings.NOTIFICATION_INSERT_CHUNK_SIZE
+        self.deliveries: Set[asyncio.Task] = set()
+
+    async def notify(
+        self,
+        db: AnySession,
+        user_id: int,
+        type: str,
+        message: str,
+        data: Optional[Dict[str, Any]] = None
+    ) -> Notification:
+        """
+        Create one notification and push it to the user
+        """
+        notification = Notification(user_id=user_id, type=type, message=message, data=data)
+        db.add(notification)
+        # The counter isn't a profile change: keep updated_at as it is
+        await db.execute(update(User).where(User.id == user_id).values(
+            unread_notification_count=User.unread_notification_count + 1,
+            updated_at=User.updated_at
+        ))
+        await db.commit()
+        await self.manager.send_personal_message(user_id, _push_payload(notification.id, type, message, data))
+        return notification
+
+    async def notify_many(
+        self,
+        db: AnySession,
+        user_ids: Iterable[int],
+        type: str,
+        message: str,
+        data: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """
+        Create the same notification for many users in one transaction,
+        inserting `chunk_size` rows per statement, and push it to those
+        online from a background task. Returns the number of recipients.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        created_at = datetime.utcnow()
+        rows = [
+            {"user_id": user_id, "type": type, "message": message, "data": data, "read": False, "created_at": created_at}
+            for user_id in user_ids
+        ]
+
+        # Collect the new ids where the driver can return them from a multi-row insert
+        statement = insert(Notification)
+        returns_ids = db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order
+        if returns_ids:
+            statement = statement.returning(Notification.user_id, Notification.id, sort_by_parameter_order=True)
+
+        notification_ids: Dict[int, int] = {}
+        try:
+            for start in range(0, len(rows), self.chunk_size):
+                result = await db.execute(statement, rows[start:start + self.chunk_size])
+                if returns_ids:
+                    notification_ids.update(result.all())
+                await db.execute(update(User).where(
+                    User.id.in_(user_ids[start:start + self.chunk_size])
+                ).values(
+                    unread_notification_count=User.unread_notification_count + 1,
+                    updated_at=User.updated_at
+                ))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+        task = asyncio.create_task(self._push_many(user_ids, notification_ids, type, message, data))
+        self.deliveries.add(task)
+        task.add_done_callback(self.deliveries.discard)
+        return len(user_ids)
+
+    async def _push_many(
+        self,
+        user_ids: List[int],
+        notification_ids: Dict[int, int],
+        type: str,
+        message: str,
+        data: Optional[Dict[str, Any]]
+    ):
+        # Only users with an open socket somewhere need a push
+        for user_id in presence.online(user_ids):
+            payload = _push_payload(notification_ids.get(user_id), type, message, data)
+            try:
+                await self.manager.send_personal_message(user_id, payload)
+            except Exception:
+                logger.exception("Failed to push notification to user %s", user_id)
@@ -0,0 +1,66 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import and_, or_
+
+
+def encode_position(position: dict) -> str:
+    """
+    Encode an arbitrary JSON-serializable keyset position as an opaque cursor
+    """
+    payload = json.dumps(position, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_position(cursor: str) -> dict:
+    """
+    Decode a cursor produced by encode_position, raising ValueError if it is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """
+    Encode a (timestamp, id) keyset position as an opaque cursor string
+    """
+    return encode_position({"t": timestamp.isoformat(), "id": row_id})
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor, raising ValueError if it is malformed
+    """
+    position = decode_position(cursor)
+    try:
+        return datetime.fromisoformat(position["t"]), int(position["id"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def keyset_before(timestamp_column, id_column, timestamp: datetime, row_id: int):
+    """
+    Filter for rows strictly older than the (timestamp, id) position
+    """
+    return or_(
+        timestamp_column < timestamp,
+        and_(timestamp_column == timestamp, id_column < row_id)
+    )
+
+
+def keyset_after(timestamp_column, id_column, timestamp: datetime, row_id: int):
+    """
+    Filter for rows strictly newer than the (timestamp, id) position
+    """
+    return or_(
+        timestamp_column > timestamp,
+        and_(timestamp_column == timestamp, id_column > row_id)
+    )
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, Iterable, Set, Tuple
+
+from app.core.config import settings
+from app.core.message_bus import MessageBus, message_bus
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_CHANNEL = "presence"
+
+
+class PresenceRegistry:
+    """
+    In-memory record of which users hold an open websocket.
+
+    Each worker counts its own sockets per user and shares them over the
+    message bus: a delta whenever a user comes online or goes offline on
+    this worker, plus a full snapshot every heartbeat so that workers that
+    start late catch up and a crashed worker's users expire.
+    """
+
+    def __init__(self, bus: MessageBus, interval: float):
+        self.bus = bus
+        self.interval = interval
+        self.worker_id = uuid.uuid4().hex
+        # user_id -> open sockets on this worker
+        self.local: Dict[int, int] = {}
+        # worker_id -> (expires_at, user_ids online on that worker)
+        self.remote: Dict[str, Tuple[float, Set[int]]] = {}
+        self.pending: Set[asyncio.Task] = set()
+        self.snapshots = None
+        bus.subscribe(PRESENCE_CHANNEL, self._receive)
+
+    def connected(self, user_id: int):
+        count = self.local.get(user_id, 0)
+        self.local[user_id] = count + 1
+        if count == 0:
+            self._publish({"worker": self.worker_id, "user_id": user_id, "online": True})
+
+    def disconnected(self, user_id: int):
+        count = self.local.get(user_id, 0)
+        if count > 1:
+            self.local[user_id] = count - 1
+        elif count == 1:
+            del self.local[user_id]
+            self._publish({"worker": self.worker_id, "user_id": user_id, "online": False})
+
+    def is_online(self, user_id: int) -> bool:
+        return bool(self.online({user_id}))
+
+    def online(self, user_ids: Iterable[int]) -> Set[int]:
+        """
+        The subset of `user_ids` connected to any worker
+        """
+        now = time.monotonic()
+        found = {user_id for user_id in user_ids if user_id in self.local}
+        for expires_at, users in self.remote.values():
+            if expires_at > now:
+                found.update(user_id for user_id in user_ids if user_id in users)
+        return found
+
+    def _publish(self, payload: dict):
+        # Registration happens in synchronous code; the bus write runs on its own
+        try:
+            task = asyncio.get_running_loop().create_task(self.bus.publish(PRESENCE_CHANNEL, payload))
+        except RuntimeError:
+            return
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    def _receive(self, payload: dict):
+        worker_id = payload["worker"]
+        if worker_id == self.worker_id:
+            return
+        expires_at = time.monotonic() + 3 * self.interval
+        if "users" in payload:
+            self.remote[worker_id] = (expires_at, set(payload["users"]))
+            return
+        _, users = self.remote.get(worker_id, (expires_at, set()))
+        if payload["online"]:
+            users.add(payload["user_id"])
+        else:
+            users.discard(payload["user_id"])
+        self.remote[worker_id] = (expires_at, users)
+
+    async def start(self):
+        if self.snapshots is None:
+            self.snapshots = asyncio.create_task(self._send_snapshots())
+
+    async def stop(self):
+        if self.snapshots is not None:
+            self.snapshots.cancel()
+            self.snapshots = None
+
+    async def _send_snapshots(self):
+        while True:
+            try:
+                await self.bus.publish(PRESENCE_CHANNEL, {"worker": self.worker_id, "users": list(self.local)})
+            except Exception:
+                logger.exception("Failed to publish presence snapshot")
+            now = time.monotonic()
+            for worker_id in [w for w, (expires_at, _) in self.remote.items() if expires_at <= now]:
+                del self.remote[worker_id]
+            await asyncio.sleep(self.interval)
+
+
+presence = PresenceRegistry(message_bus, settings.WS_PING_INTERVAL)
@@ -0,0 +1,279 @@
+import atexit
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import event, literal, or_
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.search_index import DocumentChange, IndexStore
+from app.models import Research, Event, Resource
+
+# Searchable document types and the model that backs each of them
+SEARCH_DOCUMENTS = {
+    "research": Research,
+    "event": Event,
+    "resource": Resource,
+}
+
+# The date each document type is listed by
+DOCUMENT_DATES = {
+    "research": Research.start_date,
+    "event": Event.date,
+    "resource": Resource.created_at,
+}
+
+# A match ranked outside SQL: (id, score, date)
+RankedDocument = Tuple[int, float, Optional[datetime]]
+
+
+def document_text(instance) -> str:
+    """
+    Text that is indexed for a searchable row
+    """
+    return " ".join(filter(None, [instance.title, instance.description]))
+
+
+@dataclass
+class SearchMatch:
+    """
+    SQL filter selecting matching rows and an expression scoring them
+    """
+    condition: object
+    score: object
+
+
+class SearchBackend:
+    name = "base"
+    # False until prepare() has loaded whatever state match() relies on
+    ready = True
+    # Most matches of one type a request may page through, for rank()
+    max_candidates = 0
+
+    def match(self, doc_type: str, q: str) -> SearchMatch:
+        raise NotImplementedError
+
+    def rank(self, doc_type: str, q: str) -> Optional[List[RankedDocument]]:
+        """
+        Every match, unordered and with no score cutoff, for backends that
+        rank in Python; the caller orders and pages them and fetches only
+        the rows of a page. None for backends that rank in SQL through
+        match().
+        """
+        return None
+
+    def prepare(self, db: Session):
+        """
+        Called before a search; backends that need warm state load it here
+        """
+
+
+class LikeSearchBackend(SearchBackend):
+    """
+    Substring matching with ILIKE. Unranked and unindexed; kept as a fallback
+    """
+    name = "like"
+
+    def match(self, doc_type: str, q: str) -> SearchMatch:
+        model = SEARCH_DOCUMENTS[doc_type]
+        return SearchMatch(
+            condition=model.title.ilike(f"%{q}%") | model.description.ilike(f"%{q}%"),
+            score=literal(0.0)
+        )
+
+
+class MySQLFulltextSearchBackend(SearchBackend):
+    """
+    MATCH ... AGAINST over the FULLTEXT(title, description) indexes
+    """
+    name = "mysql"
+
+    def match(self, doc_type: str, q: str) -> SearchMatch:
+        model = SEARCH_DOCUMENTS[doc_type]
+        relevance = mysql.match(model.title, model.description, against=q).in_natural_language_mode()
+        return SearchMatch(condition=relevance, score=relevance)
+
+
+class InvertedIndexSearchBackend(SearchBackend):
+    """
+    In-process BM25 inverted index, persisted to disk and kept current by
+    session commit hooks. Intended for SQLite, tests and single-worker setups.
+
+    Matches are ranked here and never sent to the database as a whole: the
+    search endpoint pages them in Python and fetches a page's rows by id.
+    """
+    name = "inverted"
+
+    def __init__(self, path: Optional[str], max_candidates: int, save_interval: float):
+        self.store = IndexStore(path)
+        self.max_candidates = max_candidates
+        self.save_interval = save_interval
+        self.ready = False
+        self.last_saved = time.monotonic()
+        # Concurrent first searches would otherwise each rebuild and save
+        self.prepare_lock = threading.Lock()
+        # Changes committed before prepare() has finished, applied by it
+        self.queued: List[DocumentChange] = []
+        self.queue_lock = threading.Lock()
+
+    def prepare(self, db: Session):
+        with self.prepare_lock:
+            if self.ready:
+                return
+            if self.store.load():
+                self.catch_up(db)
+            else:
+                self.rebuild(db)
+            with self.queue_lock:
+                # In commit order, on top of the rows just read
+                self.store.apply(self.queued)
+                self.queued = []
+                self.ready = True
+            self.flush()
+
+    def _documents(self, db: Session, doc_type: str, *conditions) -> List[DocumentChange]:
+        model = SEARCH_DOCUMENTS[doc_type]
+        updated_at = getattr(model, "updated_at", None)
+        query = db.query(
+            model.id,
+            model.title,
+            model.description,
+            DOCUMENT_DATES[doc_type],
+            updated_at if updated_at is not None else literal(None)
+        ).filter(*conditions)
+        return [
+            DocumentChange(doc_type, row_id, " ".join(filter(None, [title, description])), date, modified)
+            for row_id, title, description, date, modified in query
+        ]
+
+    def rebuild(self, db: Session):
+        """
+        Re-index every searchable row from the database
+        """
+        changes = []
+        for doc_type in SEARCH_DOCUMENTS:
+            changes.extend(self._documents(db, doc_type))
+        with self.store.lock:
+            self.store.indexes = {}
+            self.store.marks = {}
+            self.store.apply(changes)
+        self.store.save()
+        self.last_saved = time.monotonic()
+
+    def catch_up(self, db: Session):
+        """
+        Bring a loaded snapshot up to date: re-index the rows past its
+        high-water mark (newer ids, or a later updated_at where the model
+        has one) and drop the documents whose rows are gone
+        """
+        changes = []
+        for doc_type, model in SEARCH_DOCUMENTS.items():
+            max_id, updated_at = self.store.marks.get(doc_type, (0, None))
+            newer = model.id > max_id
+            if getattr(model, "updated_at", None) is not None and updated_at is not None:
+                newer = or_(newer, model.updated_at >= updated_at)
+            changes.extend(self._documents(db, doc_type, newer))
+
+            with self.store.lock:
+                indexed = set(self.store.get(doc_type).doc_terms)
+            existing = {row_id for row_id, in db.query(model.id)}
+            changes.extend(DocumentChange(doc_type, doc_id, None) for doc_id in indexed - existing)
+        self.store.apply(changes)
+
+    def rank(self, doc_type: str, q: str) -> List[RankedDocument]:
+        with self.store.lock:
+            index = self.store.get(doc_type)
+            return [(doc_id, score, index.doc_dates.get(doc_id)) for doc_id, score in index.scores(q).items()]
+
+    def apply(self, changes: List[DocumentChange]):
+        if not self.ready:
+            with self.queue_lock:
+                if not self.ready:
+                    self.queued.extend(changes)
+                    return
+        self.store.apply(changes)
+        if time.monotonic() - self.last_saved >= self.save_interval:
+            self.flush()
+
+    def flush(self):
+        if self.store.dirty:
+            self.store.save()
+        self.last_saved = time.monotonic()
+
+
+def _changed_documents(session: Session) -> List[DocumentChange]:
+    changes = []
+    for doc_type, model in SEARCH_DOCUMENTS.items():
+        date_key = DOCUMENT_DATES[doc_type].key
+        for instance in session.new | session.dirty:
+            if isinstance(instance, model):
+                changes.append(DocumentChange(
+                    doc_type,
+                    instance.id,
+                    document_text(instance),
+                    getattr(instance, date_key),
+                    getattr(instance, "updated_at", None)
+                ))
+        for instance in session.deleted:
+            if isinstance(instance, model):
+                changes.append(DocumentChange(doc_type, instance.id, None))
+    return changes
+
+
+# Callbacks run with the document changes of each committed transaction
+document_commit_listeners: List[Callable[[List[DocumentChange]], None]] = []
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_document_changes(session, flush_context):
+    changes = _changed_documents(session)
+    if changes:
+        session.info.setdefault("search_document_changes", []).extend(changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_document_changes(session):
+    changes = session.info.pop("search_document_changes", None)
+    if changes:
+        for listener in document_commit_listeners:
+            listener(changes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_document_changes(session, previous_transaction):
+    session.info.pop("search_document_changes", None)
+
+
+def register_index_hooks(backend: InvertedIndexSearchBackend):
+    """
+    Keep the inverted index in step with committed Research/Event/Resource changes
+    """
+    document_commit_listeners.append(backend.apply)
+    atexit.register(backend.flush)
+
+
+def create_search_backend(database_uri: str) -> SearchBackend:
+    name = settings.SEARCH_BACKEND
+    if name == "auto":
+        name = "mysql" if database_uri.startswith("mysql") else "inverted"
+
+    if name == "mysql":
+        return MySQLFulltextSearchBackend()
+    if name == "like":
+        return LikeSearchBackend()
+    if name == "inverted":
+        backend = InvertedIndexSearchBackend(
+            settings.SEARCH_INDEX_PATH,
+            settings.SEARCH_MAX_CANDIDATES,
+            settings.SEARCH_INDEX_SAVE_INTERVAL
+        )
+        register_index_hooks(backend)
+        return backend
+    raise ValueError(f"Unknown search backend: {name}")
+
+
+search_backend = create_search_backend(settings.SQLALCHEMY_DATABASE_URI)
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import MemoryCache, RedisCache
+from app.core.config import settings
+from app.core.search_backend import document_commit_listeners
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_list(values: Optional[List[str]]) -> Optional[List[str]]:
+    if not values:
+        return None
+    return sorted(set(values))
+
+
+class SearchCache:
+    """
+    Caches serialized /search responses. Keys include a version counter for
+    every content type a search touches; committing a change to a
+    Research/Event/Resource row bumps its type's version, so cached pages
+    for that type are never served again and age out of the cache.
+
+    Lookups are async and run a networked backend in the threadpool. If the
+    backend is unreachable they log and behave as a miss, so searches are
+    served uncached rather than failing.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def _call(self, method, *args):
+        try:
+            if self.backend.blocking:
+                return await run_in_threadpool(method, *args)
+            return method(*args)
+        except self.backend.errors:
+            logger.warning("Search cache unavailable", exc_info=True)
+            return None
+
+    async def key(
+        self,
+        doc_types: Iterable[str],
+        q: str,
+        type: Optional[str],
+        era: Optional[List[str]],
+        date_range: Optional[List[datetime]],
+        resource_type: Optional[List[str]],
+        status: Optional[List[str]],
+        sort: str,
+        limit: int,
+        cursor: Optional[str]
+    ) -> Optional[str]:
+        """
+        The cache key of a search, or None if the cache can't be used now
+        """
+        doc_types = list(doc_types)
+        versions = await self._call(self.backend.get_counters, [f"search:{doc_type}" for doc_type in doc_types])
+        if versions is None:
+            return None
+        normalized = {
+            "q": " ".join(q.lower().split()),
+            "type": type,
+            "era": _normalize_list(era),
+            "date_range": [d.isoformat() for d in date_range] if date_range else None,
+            "resource_type": _normalize_list(resource_type),
+            "status": _normalize_list(status),
+            "sort": sort,
+            "limit": limit,
+            "cursor": cursor,
+            "versions": dict(zip(doc_types, versions)),
+        }
+        digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+        return f"search:{digest}"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = await self._call(self.backend.get, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes):
+        await self._call(self.backend.set, key, value)
+
+    def invalidate(self, changes):
+        # Runs in the commit hook; the transaction is already committed, so
+        # a failure here must not surface as a failed write
+        try:
+            for doc_type in {change.doc_type for change in changes}:
+                self.backend.incr(f"search:{doc_type}")
+        except self.backend.errors:
+            logger.warning("Search cache invalidation failed; stale pages expire with their TTL", exc_info=True)
+
+
+def create_search_cache() -> Optional[SearchCache]:
+    name = settings.SEARCH_CACHE_BACKEND
+    if name == "auto":
+        # A memory cache's version counters only move for commits made in the
+        # same process; with several workers only a shared cache stays fresh
+        name = "redis" if settings.REDIS_URL else "memory"
+    if name == "none":
+        return None
+    if name == "memory":
+        backend = MemoryCache(
+            settings.SEARCH_CACHE_TTL,
+            settings.SEARCH_CACHE_MAX_ENTRIES,
+            settings.SEARCH_CACHE_MAX_BYTES
+        )
+    elif name == "redis":
+        backend = RedisCache(
+            settings.REDIS_URL, settings.SEARCH_CACHE_TTL, prefix="gsp:", timeout=settings.SEARCH_CACHE_TIMEOUT
+        )
+    else:
+        raise ValueError(f"Unknown search cache backend: {name}")
+
+    cache = SearchCache(backend)
+    document_commit_listeners.append(cache.invalidate)
+    return cache
+
+
+search_cache = create_search_cache()
@@ -0,0 +1,223 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Split text into lowercase word tokens
+    """
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class DocumentChange(NamedTuple):
+    """
+    A committed change to a searchable row. A text of None deletes it; date
+    is what the row is ordered by, updated_at its last-modified time if the
+    model has one.
+    """
+    doc_type: str
+    doc_id: int
+    text: Optional[str]
+    date: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _format_datetime(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class InvertedIndex:
+    """
+    In-memory inverted index with BM25 ranking for a single document type.
+
+    Postings map each term to {document id: term frequency}; document lengths
+    are kept so BM25 length normalisation can be computed at query time.
+    Each document's date is kept too, so that matches can be ordered and
+    paged without asking the database.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_terms: Dict[int, Dict[str, int]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.doc_dates: Dict[int, Optional[datetime]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def add(self, doc_id: int, text: str, date: Optional[datetime] = None):
+        """
+        Index a document, replacing any previous version of it
+        """
+        self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        if not terms:
+            return
+        self.doc_terms[doc_id] = dict(terms)
+        self.doc_lengths[doc_id] = sum(terms.values())
+        self.doc_dates[doc_id] = date
+        self.total_length += self.doc_lengths[doc_id]
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+
+    def remove(self, doc_id: int):
+        """
+        Drop a document from the index if it is present
+        """
+        terms = self.doc_terms.pop(doc_id, None)
+        if not terms:
+            return
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        self.doc_dates.pop(doc_id, None)
+        for term in terms:
+            documents = self.postings.get(term)
+            if documents is None:
+                continue
+            documents.pop(doc_id, None)
+            if not documents:
+                del self.postings[term]
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """
+        Return up to `limit` (document id, BM25 score) pairs, best first
+        """
+        return heapq.nlargest(limit, self.scores(query).items(), key=lambda item: (item[1], item[0]))
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """
+        BM25 score of every document matching any term of the query
+        """
+        terms = set(tokenize(query))
+        if not terms or not self.doc_terms:
+            return {}
+
+        document_count = len(self.doc_terms)
+        average_length = self.total_length / document_count
+        scores: Dict[int, float] = {}
+        for term in terms:
+            documents = self.postings.get(term)
+            if not documents:
+                continue
+            idf = math.log(1 + (document_count - len(documents) + 0.5) / (len(documents) + 0.5))
+            for doc_id, frequency in documents.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+    def to_dict(self) -> dict:
+        return {
+            "doc_terms": {str(doc_id): terms for doc_id, terms in self.doc_terms.items()},
+            "doc_dates": {str(doc_id): _format_datetime(date) for doc_id, date in self.doc_dates.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "InvertedIndex":
+        index = cls()
+        dates = data.get("doc_dates", {})
+        for doc_id, terms in data.get("doc_terms", {}).items():
+            date = _parse_datetime(dates.get(doc_id))
+            doc_id = int(doc_id)
+            index.doc_terms[doc_id] = terms
+            index.doc_dates[doc_id] = date
+            index.doc_lengths[doc_id] = sum(terms.values())
+            index.total_length += index.doc_lengths[doc_id]
+            for term, frequency in terms.items():
+                index.postings.setdefault(term, {})[doc_id] = frequency
+        return index
+
+
+class IndexStore:
+    """
+    One inverted index per document type, persisted together as one JSON
+    file. Alongside them it keeps a high-water mark per type, the highest
+    id and updated_at applied, so that a loaded snapshot can be caught up
+    with the rows written after it was saved.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.indexes: Dict[str, InvertedIndex] = {}
+        # doc type -> (max id, max updated_at) of the changes applied
+        self.marks: Dict[str, Tuple[int, Optional[datetime]]] = {}
+        self.lock = threading.RLock()
+        self.dirty = False
+
+    def get(self, name: str) -> InvertedIndex:
+        with self.lock:
+            if name not in self.indexes:
+                self.indexes[name] = InvertedIndex()
+            return self.indexes[name]
+
+    def apply(self, changes: Iterable[DocumentChange]):
+        """
+        Apply document changes in the order they were committed
+        """
+        with self.lock:
+            for change in changes:
+                if change.text is None:
+                    self.get(change.doc_type).remove(change.doc_id)
+                else:
+                    self.get(change.doc_type).add(change.doc_id, change.text, change.date)
+                max_id, updated_at = self.marks.get(change.doc_type, (0, None))
+                if change.updated_at is not None and (updated_at is None or change.updated_at > updated_at):
+                    updated_at = change.updated_at
+                self.marks[change.doc_type] = (max(max_id, change.doc_id), updated_at)
+                self.dirty = True
+
+    def load(self) -> bool:
+        """
+        Load indexes from disk, returning False if there was nothing to load
+        """
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if "indexes" not in data:
+            # A snapshot from before high-water marks; rebuild rather than guess
+            return False
+        with self.lock:
+            self.indexes = {name: InvertedIndex.from_dict(value) for name, value in data["indexes"].items()}
+            self.marks = {
+                name: (max_id, _parse_datetime(updated_at))
+                for name, (max_id, updated_at) in data.get("marks", {}).items()
+            }
+            self.dirty = False
+        return True
+
+    def save(self):
+        """
+        Atomically write all indexes to disk
+        """
+        if not self.path:
+            return
+        with self.lock:
+            data = {
+                "indexes": {name: index.to_dict() for name, index in self.indexes.items()},
+                "marks": {
+                    name: [max_id, _format_datetime(updated_at)]
+                    for name, (max_id, updated_at) in self.marks.items()
+                },
+            }
+            self.dirty = False
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.sql")
+slow_logger = logging.getLogger("app.sql.slow")
+
+
+class QueryStats:
+    """
+    Statements executed on behalf of one request: how many, their total
+    time and the slowest of them
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.slowest:
+            self.slowest = elapsed
+            self.slowest_statement = statement
+
+    def server_timing(self) -> str:
+        return (
+            f'db;desc="{self.count} queries";dur={self.total * 1000:.1f}, '
+            f"db-slowest;dur={self.slowest * 1000:.1f}"
+        )
+
+
+# Stats of the request being served. Threadpool calls and async driver
+# greenlets run in a copy of the request's context, so they see the same object.
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar("sql_query_stats", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"%\(\w+\)s|%s|:\w+|\?")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROW_LIST = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    The statement with literals and bound parameters replaced by ?, and
+    IN lists and multi-row VALUES collapsed, so that the same query with
+    different arguments normalizes the same way
+    """
+    normalized = _STRING.sub("?", statement)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _PARAMETER.sub("?", normalized)
+    normalized = _VALUE_LIST.sub("(...)", normalized)
+    normalized = _ROW_LIST.sub("(...)", normalized)
+    return _SPACE.sub(" ", normalized).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    """
+    Short stable id of a normalized statement, for grouping log lines
+    """
+    return hashlib.md5(normalized.encode()).hexdigest()[:12]
+
+
+def instrument_engine(engine: Engine):
+    """
+    Time every statement run on `engine` (for an AsyncEngine, pass its
+    sync_engine), adding it to the current request's stats and sending
+    those slower than SQL_SLOW_QUERY_THRESHOLD to the slow-query log
+    """
+    if not settings.SQL_STATS_ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = current_stats.get()
+        if stats is not None:
+            stats.record(statement, elapsed)
+        if elapsed >= settings.SQL_SLOW_QUERY_THRESHOLD:
+            normalized = normalize_statement(statement)
+            digest = fingerprint(normalized)
+            slow_logger.warning(
+                "Slow query %.1f ms [%s] %s",
+                elapsed * 1000,
+                digest,
+                normalized,
+                extra={"duration_ms": round(elapsed * 1000, 1), "fingerprint": digest, "sql": normalized}
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def discard_timer(exception_context):
+        # after_cursor_execute never runs for a failed statement
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+class SQLStatsMiddleware:
+    """
+    Collects QueryStats for each HTTP request and logs them once the
+    response is sent: at INFO for requests slower than
+    SQL_SLOW_REQUEST_THRESHOLD, otherwise at DEBUG. With SQL_STATS_HEADER
+    they are also reported in a Server-Timing response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.SQL_STATS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_stats.set(stats)
+        status_code = None
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.SQL_STATS_HEADER:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", stats.server_timing().encode()))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            level = logging.INFO if elapsed >= settings.SQL_SLOW_REQUEST_THRESHOLD else logging.DEBUG
+            if logger.isEnabledFor(level):
+                logger.log(
+                    level,
+                    "%s %s %s queries=%d db_ms=%.1f slowest_ms=%.1f total_ms=%.1f",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    stats.count,
+                    stats.total * 1000,
+                    stats.slowest * 1000,
+                    elapsed * 1000,
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status_code,
+                        "sql_queries": stats.count,
+                        "sql_ms": round(stats.total * 1000, 1),
+                        "sql_slowest_ms": round(stats.slowest * 1000, 1),
+                        "sql_slowest": normalize_statement(stats.slowest_statement) if stats.slowest_statement else None,
+                        "duration_ms": round(elapsed * 1000, 1),
+                    }
+                )
@@ -1,44 +1,373 @@
 from fastapi import WebSocket
-from typing import Dict, List
+from starlette.websockets import WebSocketState
+from typing import Dict, Optional, Set, Tuple, Union
+from collections import deque
+import asyncio
 import json
+import logging
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from app.core.auth import CurrentUser, authenticate_token
+from app.core.config import settings
+from app.core.message_bus import MessageBus, message_bus
+from app.core.presence import presence
+
+logger = logging.getLogger(__name__)
+
+# What to do when a client's outbound queue is full
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+DISCONNECT = "disconnect"
+
+PING = {"type": "ping"}
+
+# Closes started from synchronous code. The event loop only keeps weak
+# references to tasks, so they are held here until they finish.
+closing: Set[asyncio.Task] = set()
+
+def encode_json(message) -> str:
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+def encode_msgpack(message) -> bytes:
+    return msgpack.packb(message)
+
+# Frame encodings a client may ask for; msgpack frames are binary
+ENCODERS = {"json": encode_json}
+if msgpack is not None:
+    ENCODERS["msgpack"] = encode_msgpack
+
+async def receive_frame(websocket: WebSocket) -> Optional[Union[str, bytes]]:
+    """
+    Wait for the next text or binary frame; None once the client has gone
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        return None
+    if message.get("text") is not None:
+        return message["text"]
+    return message.get("bytes") or b""
+
+async def authenticate_websocket(websocket: WebSocket) -> Tuple[Optional[CurrentUser], dict]:
+    """
+    Read the client's first frame, {"type": "auth", "token": <jwt>, ...} as
+    text or UTF-8 bytes, and return the active user it identifies (or None)
+    along with the frame, which also carries the client's delivery options
+    """
+    try:
+        frame = await asyncio.wait_for(receive_frame(websocket), settings.WS_AUTH_TIMEOUT)
+        if frame is None:
+            return None, {}
+        frame = json.loads(frame)
+        if frame.get("type") != "auth":
+            return None, {}
+        user = await authenticate_token(frame["token"])
+    except (asyncio.TimeoutError, ValueError, KeyError, TypeError, AttributeError):
+        return None, {}
+    if user is None:
+        return None, {}
+    return user, frame
+
+class Connection:
+    """
+    A websocket with a bounded outbound queue drained by its own writer task,
+    so a slow or dead client only ever delays its own messages.
+
+    With a batch size above one the writer waits up to `batch_delay` for
+    more messages and sends up to `batch_size` of them in a single
+    {"type": "batch", "events": [...]} frame. `greeting` is sent as JSON
+    text before anything else.
+    """
+
+    def __init__(
+        self,
+        user_id: int,
+        websocket: WebSocket,
+        max_queue: int,
+        policy: str,
+        send_timeout: float,
+        on_close,
+        batch_size: int = 1,
+        batch_delay: float = 0.0,
+        encoding: str = "json",
+        greeting: Optional[dict] = None
+    ):
+        self.user_id = user_id
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.on_close = on_close
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.encode = ENCODERS[encoding]
+        self.greeting = greeting
+        self.queue: deque = deque()
+        self.ready = asyncio.Event()
+        self.batch_full = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+        self.missed_pongs = 0
+        self.writer = asyncio.create_task(self._drain())
+
+    def enqueue(self, message: dict):
+        """
+        Queue a message without waiting, applying the slow-consumer policy
+        if the queue is full
+        """
+        if self.closed:
+            return
+        if len(self.queue) >= self.max_queue:
+            if self.policy == DISCONNECT:
+                self.close_soon(code=1013)
+                return
+            if self.policy == COALESCE and self._coalesce(message):
+                return
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(message)
+        self.ready.set()
+        if len(self.queue) >= self.batch_size:
+            self.batch_full.set()
+
+    def _coalesce(self, message: dict) -> bool:
+        # Replace the newest pending message with the same key, e.g. a stale unread count
+        key = message.get("coalesce_key", message.get("type"))
+        for index in range(len(self.queue) - 1, -1, -1):
+            pending = self.queue[index]
+            if pending.get("coalesce_key", pending.get("type")) == key:
+                self.queue[index] = message
+                self.dropped += 1
+                return True
+        return False
+
+    async def _drain(self):
+        try:
+            if self.greeting is not None:
+                await self._send(encode_json(self.greeting))
+            while True:
+                await self.ready.wait()
+                if self.batch_size > 1:
+                    await self._send_batches()
+                else:
+                    while self.queue:
+                        await self._send(self.encode(self.queue.popleft()))
+                self.ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.info("Closing websocket after failed send: %r", exc)
+            await self.close()
+
+    async def _send_batches(self):
+        if len(self.queue) < self.batch_size:
+            # Give a burst a moment to accumulate; a full batch cuts the wait short
+            timer = asyncio.get_running_loop().call_later(self.batch_delay, self.batch_full.set)
+            try:
+                await self.batch_full.wait()
+            finally:
+                timer.cancel()
+        while self.queue:
+            count = min(self.batch_size, len(self.queue))
+            events = [self.queue.popleft() for _ in range(count)]
+            await self._send(self.encode({"type": "batch", "events": events}))
+        self.batch_full.clear()
+
+    async def _send(self, frame: Union[str, bytes]):
+        if isinstance(frame, str):
+            coroutine = self.websocket.send_text(frame)
+        else:
+            coroutine = self.websocket.send_bytes(frame)
+        # asyncio.wait rather than wait_for, which can swallow a cancellation
+        # that races with the send completing (before Python 3.12)
+        send = asyncio.ensure_future(coroutine)
+        # Mark failures as retrieved even if this writer is cancelled mid-send
+        send.add_done_callback(lambda future: future.cancelled() or future.exception())
+        try:
+            done, _ = await asyncio.wait({send}, timeout=self.send_timeout)
+        finally:
+            if not send.done():
+                send.cancel()
+        if not done:
+            raise asyncio.TimeoutError("websocket send timed out")
+        send.result()
+
+    def close_soon(self, code: int = 1000):
+        """
+        Close from code that can't await, e.g. a bus delivery
+        """
+        task = asyncio.create_task(self.close(code=code))
+        closing.add(task)
+        task.add_done_callback(closing.discard)
+
+    async def close(self, code: int = 1000):
+        if self.closed:
+            return
+        self.closed = True
+        if self.writer is not asyncio.current_task():
+            self.writer.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+        self.on_close(self)
 
 class ConnectionManager:
-    def __init__(self):
-        # Store active connections: user_id -> WebSocket
-        self.active_connections: Dict[int, WebSocket] = {}
+    """
+    Registry of open websockets. A user may hold any number of sockets (tabs,
+    devices); a reverse socket -> connection map makes removal O(1).
+
+    Sends go through the message bus on this manager's channel; every worker
+    receives them and delivers to the sockets it holds locally.
+    """
+
+    def __init__(
+        self,
+        channel: str = "default",
+        bus: Optional[MessageBus] = None,
+        max_queue: Optional[int] = None,
+        policy: Optional[str] = None,
+        send_timeout: Optional[float] = None,
+        ping_interval: Optional[float] = None,
+        max_missed_pongs: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        batch_delay: Optional[float] = None
+    ):
+        self.channel = channel
+        self.bus = bus or message_bus
+        self.bus.subscribe(channel, self._deliver)
+        # Store active connections: user_id -> that user's connections
+        self.active_connections: Dict[int, Set[Connection]] = {}
+        # Reverse map: websocket -> Connection
+        self.connections_by_socket: Dict[WebSocket, Connection] = {}
+        self.max_queue = max_queue or settings.WS_SEND_QUEUE_SIZE
+        self.policy = policy or settings.WS_SLOW_CONSUMER_POLICY
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT
+        self.ping_interval = ping_interval or settings.WS_PING_INTERVAL
+        self.max_missed_pongs = max_missed_pongs or settings.WS_MAX_MISSED_PONGS
+        self.batch_size = batch_size or settings.WS_BATCH_MAX_EVENTS
+        self.batch_delay = batch_delay or settings.WS_BATCH_MAX_DELAY
+        self.heartbeat = None
+
+    @property
+    def total_connections(self) -> int:
+        return len(self.connections_by_socket)
+
+    def connection_count(self, user_id: int) -> int:
+        return len(self.active_connections.get(user_id, ()))
+
+    def is_connected(self, user_id: int) -> bool:
+        return user_id in self.active_connections
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
 
+    async def reject(self, websocket: WebSocket):
+        """
+        Close a socket that failed to authenticate, unless the client left
+        """
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close(code=1008)
+
     def disconnect(self, websocket: WebSocket):
         # Remove the websocket from active connections
-        for user_id, connection in self.active_connections.items():
-            if connection == websocket:
-                del self.active_connections[user_id]
-                break
+        connection = self.connections_by_socket.get(websocket)
+        if connection is None:
+            return
+        connection.closed = True
+        connection.writer.cancel()
+        self._forget(connection)
+
+    def _forget(self, connection: Connection):
+        if self.connections_by_socket.get(connection.websocket) is not connection:
+            return
+        del self.connections_by_socket[connection.websocket]
+        user_connections = self.active_connections.get(connection.user_id)
+        if user_connections is not None:
+            user_connections.discard(connection)
+            if not user_connections:
+                del self.active_connections[connection.user_id]
+        presence.disconnected(connection.user_id)
+
+    def add_connection(self, user_id: int, websocket: WebSocket, options: Optional[dict] = None) -> Connection:
+        """
+        Register an accepted socket. `options` are the client's delivery
+        preferences, "batch" (bool) and "encoding" ("json" or "msgpack");
+        when given, the outcome is confirmed in a "ready" frame.
+        """
+        self.disconnect(websocket)
+        options = options or {}
+        batch = bool(options.get("batch"))
+        encoding = options.get("encoding", "json")
+        if encoding not in ENCODERS:
+            encoding = "json"
+        greeting = None
+        if "batch" in options or "encoding" in options:
+            greeting = {"type": "ready", "batch": batch, "encoding": encoding}
+        connection = Connection(
+            user_id, websocket, self.max_queue, self.policy, self.send_timeout, on_close=self._forget,
+            batch_size=self.batch_size if batch else 1,
+            batch_delay=self.batch_delay,
+            encoding=encoding,
+            greeting=greeting
+        )
+        self.connections_by_socket[websocket] = connection
+        self.active_connections.setdefault(user_id, set()).add(connection)
+        presence.connected(user_id)
+        if self.heartbeat is None:
+            self.heartbeat = asyncio.create_task(self._heartbeat())
+        return connection
 
-    def add_connection(self, user_id: int, websocket: WebSocket):
-        self.active_connections[user_id] = websocket
+    def received(self, websocket: WebSocket):
+        """
+        Record that a frame (a pong or anything else) arrived on a socket
+        """
+        connection = self.connections_by_socket.get(websocket)
+        if connection is not None:
+            connection.missed_pongs = 0
+
+    async def _heartbeat(self):
+        # Ping every socket each interval; evict those that stopped answering.
+        # Exits once the manager holds no sockets, add_connection restarts it.
+        while self.connections_by_socket:
+            await asyncio.sleep(self.ping_interval)
+            for connection in list(self.connections_by_socket.values()):
+                if connection.missed_pongs >= self.max_missed_pongs:
+                    connection.close_soon(code=1001)
+                else:
+                    connection.missed_pongs += 1
+                    connection.enqueue(PING)
+        self.heartbeat = None
 
     async def send_personal_message(self, user_id: int, message: dict):
         """
-        Send a message to a specific user
+        Send a message to every connection of a specific user
         """
-        if user_id in self.active_connections:
-            websocket = self.active_connections[user_id]
-            await websocket.send_json(message)
+        await self.bus.publish(self.channel, {"user_id": user_id, "message": message})
 
     async def broadcast(self, message: dict):
         """
         Broadcast a message to all connected users
         """
-        for connection in self.active_connections.values():
-            await connection.send_json(message)
+        await self.bus.publish(self.channel, {"message": message})
 
     async def broadcast_except(self, message: dict, exclude_user_id: int):
         """
         Broadcast a message to all connected users except one
         """
-        for user_id, connection in self.active_connections.items():
-            if user_id != exclude_user_id:
-                await connection.send_json(message) 
\ No newline at end of file
+        await self.bus.publish(self.channel, {"exclude_user_id": exclude_user_id, "message": message})
+
+    def _deliver(self, envelope: dict):
+        # Called by the bus for every publish on this channel, from any worker
+        message = envelope["message"]
+        if "user_id" in envelope:
+            for connection in list(self.active_connections.get(envelope["user_id"], ())):
+                connection.enqueue(message)
+            return
+        exclude_user_id = envelope.get("exclude_user_id")
+        for connection in list(self.connections_by_socket.values()):
+            if connection.user_id != exclude_user_id:
+                connection.enqueue(message)
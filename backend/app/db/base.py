@@ -2,26 +2,24 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine, event
 from app.core.config import settings
+from app.core.sql_stats import instrument_engine
 from app.db.base_class import Base
+from app.db.pool import engine_options
 from app.models.user import User
 from app.models.message import Message, Conversation
-from app.models.notification import Notification
+from app.models.notification import Notification, NotificationArchive
 
-# Create MySQL engine with specific configuration
+# Pool sizing and per-dialect options come from the DB_POOL_* settings
 engine = create_engine(
     settings.SQLALCHEMY_DATABASE_URI,
-    pool_pre_ping=True,
-    pool_recycle=3600,  # Recycle connections after 1 hour
-    pool_size=5,  # Maximum number of permanent connections
-    max_overflow=10,  # Maximum number of connections that can be created beyond pool_size
     echo=False,  # Set to True to log all SQL queries
+    **engine_options(settings.SQLALCHEMY_DATABASE_URI)
 )
+instrument_engine(engine)
 
-# Configure MySQL session settings
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Configure MySQL connection for proper UTF-8 handling
-@event.listens_for(engine, 'connect')
 def set_mysql_charset(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     cursor.execute('SET NAMES utf8mb4')
@@ -29,6 +27,9 @@ def set_mysql_charset(dbapi_connection, connection_record):
     cursor.execute('SET character_set_connection=utf8mb4')
     cursor.close()
 
+if engine.dialect.name == "mysql":
+    event.listen(engine, 'connect', set_mysql_charset)
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -38,4 +39,4 @@ def get_db():
         db.close()
 
 # Import all models here that are needed by Alembic
-__all__ = ["User", "Message", "Conversation", "Notification"] 
\ No newline at end of file
+__all__ = ["User", "Message", "Conversation", "Notification", "NotificationArchive"] 
\ No newline at end of file
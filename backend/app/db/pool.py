@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics:
+    """
+    Checkout counters for one pool: how long callers waited for a
+    connection (as a histogram plus a window of recent waits), how many
+    gave up after pool_timeout, and the most connections in use at once
+    """
+
+    def __init__(self, window: int = 1000):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+        self.recent = deque(maxlen=window)
+        self.peak_checked_out = 0
+        self.lock = threading.Lock()
+
+    def observe(self, wait: float, checked_out: int):
+        bucket = next((i for i, bound in enumerate(WAIT_BUCKETS) if wait <= bound), len(WAIT_BUCKETS))
+        with self.lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_buckets[bucket] += 1
+            self.recent.append(wait)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def timed_out(self):
+        with self.lock:
+            self.timeouts += 1
+
+    def drain(self) -> Tuple[List[float], int]:
+        """
+        Waits and peak usage since the last drain
+        """
+        with self.lock:
+            waits, peak = list(self.recent), self.peak_checked_out
+            self.recent.clear()
+            self.peak_checked_out = 0
+        return waits, peak
+
+
+class MeteredPoolMixin:
+    """
+    Records PoolMetrics around QueuePool checkouts, and lets the monitor
+    move the pool's connection limit.
+
+    QueuePool has no public API for either: this hooks its _do_get() and
+    changes its _max_overflow under _overflow_lock. Both are stable across
+    SQLAlchemy 2.0 and 2.1, which is why the requirements cap SQLAlchemy
+    below 2.2; check them again before raising the cap.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timed_out()
+            raise
+        self.metrics.observe(time.perf_counter() - started, self.checkedout())
+        return record
+
+    def resizable(self) -> bool:
+        return hasattr(self, "_overflow_lock") and hasattr(self, "_max_overflow")
+
+    def limit(self) -> int:
+        """
+        Most connections open at once: pool_size plus max_overflow
+        """
+        return self.size() + self._max_overflow
+
+    def set_limit(self, limit: int):
+        # Idle connections beyond pool_size are still closed on return
+        with self._overflow_lock:
+            self._max_overflow = limit - self.size()
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool (with the current limit);
+        # keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    pass
+
+
+class MeteredAsyncQueuePool(MeteredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(database_uri: str, asyncio: bool = False) -> dict:
+    """
+    create_engine() pooling arguments for the database's dialect, sized
+    from the DB_POOL_* settings
+    """
+    url = make_url(database_uri)
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            # One shared connection; there is nothing to size
+            return {}
+        # Local file: a dead connection is impossible, so skip the per-checkout ping
+        options = {"pool_pre_ping": False}
+    else:
+        options = {"pool_pre_ping": True, "pool_recycle": settings.DB_POOL_RECYCLE}
+    options.update(
+        poolclass=MeteredAsyncQueuePool if asyncio else MeteredQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    return options
+
+
+def pool_status(pool) -> dict:
+    """
+    Current usage and lifetime counters of a metered pool
+    """
+    metrics = pool.metrics
+    with metrics.lock:
+        return {
+            "size": pool.size(),
+            "limit": pool.limit(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "checkouts": metrics.checkouts,
+            "timeouts": metrics.timeouts,
+            "wait_ms_total": round(metrics.wait_total * 1000, 1),
+            "wait_histogram": dict(zip([f"le_{bound}" for bound in WAIT_BUCKETS] + ["inf"], metrics.wait_buckets)),
+        }
+
+
+class PoolMonitor:
+    """
+    Logs the engines' pool metrics every `interval` seconds. In adaptive
+    mode it also moves each pool's connection limit (pool_size plus
+    overflow) between its configured value and `max_size`: up a step when
+    the 95th percentile checkout wait exceeds `target_wait`, down a step
+    when waits stay negligible and peak usage is under half the limit.
+    Idle connections beyond pool_size are still closed on return, so only
+    the limit changes.
+    """
+
+    def __init__(self, engines: Iterable, interval: float, adaptive: bool, max_size: int, target_wait: float):
+        self.engines = [engine for engine in engines if isinstance(engine.pool, MeteredPoolMixin)]
+        self.interval = interval
+        if adaptive and not all(engine.pool.resizable() for engine in self.engines):
+            logger.warning("This SQLAlchemy version's pools cannot be resized; ignoring DB_POOL_ADAPTIVE")
+            adaptive = False
+        self.adaptive = adaptive
+        self.max_size = max_size
+        self.target_wait = target_wait
+        self.min_limits = {id(engine): engine.pool.limit() for engine in self.engines}
+        self.runner = None
+
+    async def start(self):
+        if self.runner is None and self.engines and self.interval > 0:
+            self.runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.runner is not None:
+            self.runner.cancel()
+            self.runner = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            for engine in self.engines:
+                try:
+                    self.check(engine)
+                except Exception:
+                    logger.exception("Pool monitor failed")
+
+    def check(self, engine) -> Optional[int]:
+        """
+        Log one engine's pool metrics and, in adaptive mode, resize the
+        pool; returns the new limit if it changed
+        """
+        pool = engine.pool
+        status = pool_status(pool)
+        waits, peak = pool.metrics.drain()
+        logger.info(
+            "Pool %s checked_out=%d overflow=%d limit=%d timeouts=%d",
+            engine.url.drivername,
+            status["checked_out"],
+            status["overflow"],
+            status["limit"],
+            status["timeouts"],
+            extra={"pool": status}
+        )
+        if not self.adaptive or not waits:
+            return None
+
+        waits.sort()
+        p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+        limit = status["limit"]
+        step = max(1, limit // 4)
+        if p95 > self.target_wait and limit < self.max_size:
+            new_limit = min(self.max_size, limit + step)
+        elif p95 < self.target_wait / 10 and peak < limit // 2:
+            new_limit = max(self.min_limits[id(engine)], limit - step)
+        else:
+            return None
+        if new_limit == limit:
+            return None
+        pool.set_limit(new_limit)
+        logger.info("Pool connection limit %d -> %d (p95 checkout wait %.1f ms)", limit, new_limit, p95 * 1000)
+        return new_limit
@@ -0,0 +1,50 @@
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """
+    Records every SQL statement executed on an engine while active.
+
+    Usable as a context manager:
+
+        with QueryCounter(engine) as counter:
+            client.get("/api/v1/search", params={"q": "levee"})
+        assert counter.count == 3, counter.statements
+
+    For an AsyncEngine pass its `sync_engine`.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+@contextmanager
+def assert_max_queries(engine: Engine, expected: int):
+    """
+    Fail if more than `expected` SQL statements run inside the block.
+    Guards endpoints against N+1 relationship loads creeping back in.
+    """
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > expected:
+        executed = "\n".join(f"  {i}. {statement}" for i, statement in enumerate(counter.statements, 1))
+        raise AssertionError(f"Expected at most {expected} queries, {counter.count} were executed:\n{executed}")
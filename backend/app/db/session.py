@@ -0,0 +1,119 @@
+from typing import AsyncIterator, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.sql_stats import instrument_engine
+from app.db.base import SessionLocal, engine
+from app.db.pool import PoolMonitor, engine_options
+
+
+def async_database_uri(uri: str) -> str:
+    """
+    Swap the driver in a database URI for its asyncio counterpart
+    """
+    scheme, sep, rest = uri.partition("://")
+    dialect = scheme.split("+")[0]
+    if dialect == "mysql":
+        return f"mysql+aiomysql{sep}{rest}"
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return uri
+
+
+class ThreadedSession:
+    """
+    Exposes the awaitable subset of the AsyncSession API over a synchronous
+    Session, running each database round-trip in the threadpool so that
+    handlers never block the event loop. Used in "sync" engine mode.
+    """
+
+    def __init__(self, sync_session: Session):
+        self.sync_session = sync_session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    def get_bind(self, *args, **kwargs):
+        return self.sync_session.get_bind(*args, **kwargs)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def refresh(self, instance, *args, **kwargs):
+        await run_in_threadpool(self.sync_session.refresh, instance, *args, **kwargs)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+
+AnySession = Union[AsyncSession, ThreadedSession]
+
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ENGINE_MODE == "async":
+    async_uri = async_database_uri(settings.SQLALCHEMY_DATABASE_URI)
+    async_engine = create_async_engine(async_uri, echo=False, **engine_options(async_uri, asyncio=True))
+    instrument_engine(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+pool_monitor = PoolMonitor(
+    [engine] + ([async_engine.sync_engine] if async_engine is not None else []),
+    settings.DB_POOL_STATS_INTERVAL,
+    adaptive=settings.DB_POOL_ADAPTIVE,
+    max_size=settings.DB_POOL_MAX_SIZE,
+    target_wait=settings.DB_POOL_TARGET_WAIT
+)
+
+
+def new_session() -> AnySession:
+    """
+    Awaitable database session: native asyncio drivers (aiomysql/aiosqlite)
+    in "async" mode, a threadpool-backed Session in "sync" mode. The caller
+    closes it.
+    """
+    if AsyncSessionLocal is not None:
+        return AsyncSessionLocal()
+    # Objects stay loaded after commit so handlers never lazy-load from the loop
+    return ThreadedSession(SessionLocal(expire_on_commit=False))
+
+
+# Dependency
+async def get_db() -> AsyncIterator[AnySession]:
+    """
+    Awaitable database session for request handlers
+    """
+    db = new_session()
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -0,0 +1,122 @@
+import logging
+import time
+from typing import Any, List, Tuple
+
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.base import engine
+from app.db.session import async_engine, new_session
+
+logger = logging.getLogger(__name__)
+
+# Statements on hot request paths, with placeholder parameters to run them with
+hot_statements: List[Tuple[Any, dict]] = []
+
+
+def hot_statement(statement, **params):
+    """
+    Register a module-level statement for the startup warmup and return it
+    unchanged. `params` are placeholder values for its bound parameters,
+    chosen to match no rows; only SELECTs are ever run with them.
+    """
+    hot_statements.append((statement, params))
+    return statement
+
+
+def _warmup_size(pool) -> int:
+    if isinstance(pool, QueuePool):
+        return max(0, min(settings.DB_WARMUP_CONNECTIONS, pool.size()))
+    # SQLite in memory: a single shared connection
+    return 1
+
+
+async def open_connections() -> int:
+    """
+    Check out DB_WARMUP_CONNECTIONS connections per engine at once, so that
+    they are connected, configured and idle in the pool when the first
+    requests arrive. Returns how many were opened.
+    """
+    def open_sync(count: int):
+        connections = [engine.connect() for _ in range(count)]
+        for connection in connections:
+            connection.close()
+
+    count = _warmup_size(engine.pool)
+    await run_in_threadpool(open_sync, count)
+    opened = count
+
+    if async_engine is not None:
+        connections = []
+        for _ in range(_warmup_size(async_engine.sync_engine.pool)):
+            connection = async_engine.connect()
+            await connection.start()
+            connections.append(connection)
+        for connection in connections:
+            await connection.close()
+        opened += len(connections)
+    return opened
+
+
+async def compile_hot_statements() -> int:
+    """
+    Run every registered hot SELECT once, through the same kind of session
+    the handlers use, and roll back. This fills the engine's
+    compiled-statement cache and the ORM's per-statement caches with
+    exactly the entries real requests will look up.
+
+    Writes are never executed, placeholders or not: an UPDATE or DELETE
+    would take row locks on live tables during every deploy. They are only
+    compiled for the engine's dialect, which sets up the ORM and compiler
+    state they need; their first real execution fills the statement cache.
+    Returns how many statements were warmed.
+    """
+    compiled = 0
+    dialect = (async_engine.sync_engine if async_engine is not None else engine).dialect
+    db = new_session()
+    try:
+        for statement, params in hot_statements:
+            try:
+                if statement.is_select:
+                    await db.execute(statement, params)
+                else:
+                    statement.compile(dialect=dialect)
+                compiled += 1
+            except Exception:
+                logger.exception("Warmup failed to compile %s", statement)
+                await db.rollback()
+        await db.rollback()
+    finally:
+        await db.close()
+    return compiled
+
+
+async def warm_up():
+    """
+    Take the cold-start costs off the first requests of a new worker:
+    configure the mappers, open pool connections and compile the hot
+    statements
+    """
+    started = time.perf_counter()
+    try:
+        configure_mappers()
+        mapped = time.perf_counter()
+        connections = await open_connections()
+        connected = time.perf_counter()
+        statements = await compile_hot_statements()
+    except Exception:
+        # A database that isn't reachable yet must not keep the worker from starting
+        logger.exception("Warmup failed")
+        return
+    finished = time.perf_counter()
+    logger.info(
+        "Warmup finished in %.0f ms: mappers %.0f ms, %d connections %.0f ms, %d statements %.0f ms",
+        (finished - started) * 1000,
+        (mapped - started) * 1000,
+        connections,
+        (connected - mapped) * 1000,
+        statements,
+        (finished - connected) * 1000
+    )
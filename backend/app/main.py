@@ -1,11 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth, users, search, notifications, messages
+from app.api import auth, users, search, notifications, messages, presence
 from app.core.config import settings
+from app.core.lifecycle import register_lifecycle
+from app.core.responses import FastJSONResponse
+from app.core.sql_stats import SQLStatsMiddleware
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=FastJSONResponse
 )
 
 # Set up CORS middleware
@@ -15,7 +19,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"] if settings.SQL_STATS_HEADER else ["ETag"],
 )
+app.add_middleware(SQLStatsMiddleware)
 
 # Include routers
 app.include_router(auth.router, prefix=settings.API_V1_STR, tags=["auth"])
@@ -23,6 +29,9 @@ app.include_router(users.router, prefix=settings.API_V1_STR, tags=["users"])
 app.include_router(search.router, prefix=settings.API_V1_STR, tags=["search"])
 app.include_router(notifications.router, prefix=settings.API_V1_STR, tags=["notifications"])
 app.include_router(messages.router, prefix=settings.API_V1_STR, tags=["messages"])
+app.include_router(presence.router, prefix=settings.API_V1_STR, tags=["presence"])
+
+register_lifecycle(app)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,5 @@
+from app.models.user import User
+from app.models.message import Conversation, Message
+from app.models.notification import Notification, NotificationArchive
+
+__all__ = ["User", "Conversation", "Message", "Notification", "NotificationArchive"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 from datetime import datetime
@@ -10,19 +10,42 @@ class Conversation(Base):
     user1_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     user2_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Read watermarks: each participant has read every message up to this id
+    user1_last_read_message_id = Column(Integer, nullable=False, default=0, server_default="0")
+    user2_last_read_message_id = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     user1 = relationship("User", foreign_keys=[user1_id], back_populates="conversations_as_user1")
     user2 = relationship("User", foreign_keys=[user2_id], back_populates="conversations_as_user2")
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
 
+    def other_participant_id(self, user_id: int) -> int:
+        return self.user2_id if self.user1_id == user_id else self.user1_id
+
+    def last_read_message_id(self, user_id: int) -> int:
+        if self.user1_id == user_id:
+            return self.user1_last_read_message_id or 0
+        return self.user2_last_read_message_id or 0
+
+    def is_read(self, message: "Message") -> bool:
+        """
+        Whether the message's recipient has read it
+        """
+        return message.id <= self.last_read_message_id(self.other_participant_id(message.sender_id))
+
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Keyset pagination over a conversation's history
+        Index("ix_messages_conversation_id_created_at_id", "conversation_id", "created_at", "id"),
+        Base.__table_args__,
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     content = Column(Text, nullable=False)
+    # No longer written; superseded by the conversation read watermarks
     read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -1,10 +1,17 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 from datetime import datetime
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Unread lookups and counter rebuilds
+        Index("ix_notifications_user_id_read_created_at", "user_id", "read", "created_at"),
+        # Keyset pages of a user's feed
+        Index("ix_notifications_user_id_created_at_id", "user_id", "created_at", "id"),
+        Base.__table_args__,
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -14,4 +21,19 @@ class Notification(Base):
     read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    user = relationship("User", back_populates="notifications") 
\ No newline at end of file
+    user = relationship("User", back_populates="notifications") 
+
+class NotificationArchive(Base):
+    """
+    Notifications removed by the retention purger, when archiving to a table
+    """
+    __tablename__ = "notifications_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, index=True)
+    type = Column(String(50), nullable=False)
+    message = Column(String(255), nullable=False)
+    data = Column(JSON, nullable=True)
+    read = Column(Boolean, default=False)
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
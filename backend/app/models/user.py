@@ -12,10 +12,13 @@ class User(Base):
     full_name = Column(String(255))
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
+    # Kept in step with notifications.read by every write that changes it
+    unread_notification_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Messaging relationships
     conversations_as_user1 = relationship("Conversation", foreign_keys="Conversation.user1_id", back_populates="user1")
     conversations_as_user2 = relationship("Conversation", foreign_keys="Conversation.user2_id", back_populates="user2")
-    sent_messages = relationship("Message", back_populates="sender") 
\ No newline at end of file
+    sent_messages = relationship("Message", back_populates="sender")
+    notifications = relationship("Notification", back_populates="user") 
\ No newline at end of file
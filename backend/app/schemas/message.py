@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class MessageBase(BaseModel):
@@ -18,6 +18,11 @@ class MessageResponse(MessageBase):
     class Config:
         orm_mode = True
 
+class MessagePage(BaseModel):
+    items: List[MessageResponse]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
 class ConversationBase(BaseModel):
     participant_id: int
 
@@ -33,4 +38,8 @@ class ConversationResponse(ConversationBase):
     unread_count: int = 0
 
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True
+
+class ConversationPage(BaseModel):
+    items: List[ConversationResponse]
+    next_cursor: Optional[str] = None 
\ No newline at end of file
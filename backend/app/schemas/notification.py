@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 class NotificationBase(BaseModel):
@@ -10,6 +10,10 @@ class NotificationBase(BaseModel):
 class NotificationCreate(NotificationBase):
     user_id: int
 
+class NotificationBulkCreate(NotificationBase):
+    # None notifies every active user
+    user_ids: Optional[List[int]] = None
+
 class NotificationResponse(NotificationBase):
     id: int
     user_id: int
@@ -17,4 +21,11 @@ class NotificationResponse(NotificationBase):
     created_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class NotificationPage(BaseModel):
+    items: List[NotificationResponse]
+    next_cursor: Optional[str] = None
+
+class UnreadCountResponse(BaseModel):
+    count: int
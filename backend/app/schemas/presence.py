@@ -0,0 +1,5 @@
+from pydantic import BaseModel
+
+class PresenceResponse(BaseModel):
+    user_id: int
+    online: bool
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 class SearchResult(BaseModel):
@@ -9,6 +9,11 @@ class SearchResult(BaseModel):
     description: str
     date: datetime
     metadata: Dict[str, Any]
+    score: float = 0.0
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class SearchPage(BaseModel):
+    items: List[SearchResult]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,615 @@
+"""
+Load and latency benchmark for the HTTP APIs and websocket delivery.
+
+    python -m app.tools.api_bench run --save baseline.json
+    python -m app.tools.api_bench run --baseline baseline.json --threshold 0.15
+    python -m app.tools.api_bench compare baseline.json current.json
+    python -m app.tools.api_bench coldstart
+
+`run` seeds a scratch SQLite database, or the empty database given with
+--database-url (e.g. a local MySQL), with users, conversations, messages
+and notifications. It then drives the messaging, notification and
+presence routers in-process, mounted as app.main mounts them with the
+same middleware and startup hooks: concurrent httpx clients over
+ASGITransport for each endpoint, and websocket clients speaking ASGI
+directly, timed from the POST that sends a message to the recipient's
+socket receiving it. The figures cover the application and the
+database, not the network.
+
+Throughput and p50/p95/p99 latency are printed per endpoint and can be
+saved as a JSON baseline. `compare`, or `run --baseline`, flags any
+percentile that rose, or throughput that fell, by more than --threshold,
+and exits with status 1 if there is one.
+
+`coldstart` seeds the same way, then starts the app in fresh processes,
+with and without the DB_WARMUP startup hook. Each one sends rounds of the
+conversation, message and notification list requests and reports the
+time from process start to the first round within 1.5x of the steady
+state.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+WORDS = (
+    "hurricane katrina levee gulf coast oyster shrimp bayou delta jazz blues marsh "
+    "parish creole cajun river flood sediment wetland cypress pelican harbor shipping "
+    "archive survey census migration festival cuisine dialect folklore storm"
+).split()
+
+PERCENTILES = (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99))
+
+# A cold-start round counts as fast once it is within this factor of the steady state
+FAST_FACTOR = 1.5
+
+
+def configure_environment(args, scratch: str):
+    # Settings are read on import, so this runs before any app module loads
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+    # Retention would delete seeded rows mid-run
+    os.environ["NOTIFICATION_PURGE_INTERVAL"] = "0"
+
+
+def build_app():
+    """
+    The API as app.main assembles it, limited to the routers benchmarked
+    here, so that a run needs neither the account routers nor the search
+    content models
+    """
+    from fastapi import FastAPI
+
+    from app.api import messages, notifications, presence
+    from app.core.config import settings
+    from app.core.lifecycle import register_lifecycle
+    from app.core.responses import FastJSONResponse
+    from app.core.sql_stats import SQLStatsMiddleware
+
+    app = FastAPI(title=settings.PROJECT_NAME, default_response_class=FastJSONResponse)
+    app.add_middleware(SQLStatsMiddleware)
+    for module in (notifications, messages, presence):
+        app.include_router(module.router, prefix=settings.API_V1_STR)
+    register_lifecycle(app)
+    return app
+
+
+class Dataset:
+    def __init__(self):
+        self.user_ids: List[int] = []
+        # (conversation_id, user1_id, user2_id)
+        self.conversations: List[Tuple[int, int, int]] = []
+        self.conversations_by_user: Dict[int, List[Tuple[int, int, int]]] = {}
+
+
+def _insert_chunks(connection, model, rows: List[dict], chunk_size: int = 5000):
+    from sqlalchemy import insert
+
+    for start in range(0, len(rows), chunk_size):
+        connection.execute(insert(model), rows[start:start + chunk_size])
+
+
+def seed(args) -> Dataset:
+    from app.db.base import engine
+    from app.db.base_class import Base
+    from app.models import Conversation, Message, Notification, User
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    data = Dataset()
+    data.user_ids = list(range(1, args.users + 1))
+
+    pairs = set()
+    max_pairs = args.users * (args.users - 1) // 2
+    while len(pairs) < min(args.conversations, max_pairs):
+        user1_id, user2_id = rng.sample(data.user_ids, 2)
+        if (user2_id, user1_id) not in pairs:
+            pairs.add((user1_id, user2_id))
+    data.conversations = [(i, user1_id, user2_id) for i, (user1_id, user2_id) in enumerate(sorted(pairs), 1)]
+    for conversation in data.conversations:
+        for user_id in conversation[1:]:
+            data.conversations_by_user.setdefault(user_id, []).append(conversation)
+
+    started = now - timedelta(seconds=args.messages + 1)
+    updated_at = {}
+    messages = []
+    for i in range(args.messages):
+        conversation_id, user1_id, user2_id = rng.choice(data.conversations)
+        created_at = started + timedelta(seconds=i)
+        updated_at[conversation_id] = created_at
+        messages.append({
+            "conversation_id": conversation_id,
+            "sender_id": rng.choice((user1_id, user2_id)),
+            "content": " ".join(rng.choices(WORDS, k=8)),
+            "read": False,
+            "created_at": created_at,
+        })
+
+    unread = {}
+    notifications = []
+    for i in range(args.notifications):
+        user_id = rng.choice(data.user_ids)
+        read = rng.random() < 0.5
+        if not read:
+            unread[user_id] = unread.get(user_id, 0) + 1
+        notifications.append({
+            "user_id": user_id,
+            "type": rng.choice(("message", "event", "system")),
+            "message": " ".join(rng.choices(WORDS, k=6)),
+            "data": {"ref": i},
+            "read": read,
+            "created_at": now - timedelta(seconds=args.notifications - i),
+        })
+
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        _insert_chunks(connection, User, [
+            {
+                "id": user_id,
+                "email": f"bench-{user_id}@example.org",
+                "hashed_password": "x",
+                "full_name": f"Bench User {user_id}",
+                "is_active": True,
+                "is_superuser": False,
+                "unread_notification_count": unread.get(user_id, 0),
+            }
+            for user_id in data.user_ids
+        ])
+        _insert_chunks(connection, Conversation, [
+            {"id": conversation_id, "user1_id": user1_id, "user2_id": user2_id,
+             "updated_at": updated_at.get(conversation_id, started)}
+            for conversation_id, user1_id, user2_id in data.conversations
+        ])
+        _insert_chunks(connection, Message, messages)
+        _insert_chunks(connection, Notification, notifications)
+    return data
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    summary = {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    for key, fraction in PERCENTILES:
+        value = latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] if latencies else 0.0
+        summary[key] = round(value * 1000, 2)
+    return summary
+
+
+# A request: method, path, user id to authenticate as, JSON body
+Request = Tuple[str, str, int, Optional[dict]]
+
+
+def http_scenarios(data: Dataset, prefix: str, rng: random.Random) -> List[Tuple[str, Callable[[], Request]]]:
+    participants = list(data.conversations_by_user)
+
+    def participant_of(conversation: Tuple[int, int, int]) -> int:
+        return rng.choice(conversation[1:])
+
+    def conversations() -> Request:
+        return "GET", f"{prefix}/conversations", rng.choice(participants), None
+
+    def messages() -> Request:
+        conversation = rng.choice(data.conversations)
+        return "GET", f"{prefix}/conversations/{conversation[0]}/messages", participant_of(conversation), None
+
+    def send() -> Request:
+        conversation = rng.choice(data.conversations)
+        body = {"content": " ".join(rng.choices(WORDS, k=8))}
+        return "POST", f"{prefix}/conversations/{conversation[0]}/messages", participant_of(conversation), body
+
+    def notifications() -> Request:
+        return "GET", f"{prefix}/notifications", rng.choice(data.user_ids), None
+
+    def unread_count() -> Request:
+        return "GET", f"{prefix}/notifications/unread-count", rng.choice(data.user_ids), None
+
+    return [
+        ("GET /conversations", conversations),
+        ("GET /conversations/{id}/messages", messages),
+        ("POST /conversations/{id}/messages", send),
+        ("GET /notifications", notifications),
+        ("GET /notifications/unread-count", unread_count),
+    ]
+
+
+async def run_http(client, tokens: Dict[int, str], make_request: Callable[[], Request], requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    tickets = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in tickets:
+            method, path, user_id, body = make_request()
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body, headers={"Authorization": f"Bearer {tokens[user_id]}"})
+            if response.status_code >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+class WebSocketClient:
+    """
+    Minimal in-process websocket client: runs the ASGI app on a websocket
+    scope and exchanges messages with it through queues
+    """
+
+    def __init__(self, app, path: str):
+        self.app = app
+        self.path = path
+        self.inbound: asyncio.Queue = asyncio.Queue()
+        self.outbound: asyncio.Queue = asyncio.Queue()
+        self.task = None
+
+    async def connect(self):
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": self.path,
+            "raw_path": self.path.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [],
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80),
+            "subprotocols": [],
+        }
+        self.task = asyncio.create_task(self.app(scope, self.inbound.get, self.outbound.put))
+        await self.inbound.put({"type": "websocket.connect"})
+        message = await self.outbound.get()
+        if message["type"] != "websocket.accept":
+            raise RuntimeError(f"Websocket {self.path} was not accepted: {message}")
+
+    async def send_json(self, payload: dict):
+        await self.inbound.put({"type": "websocket.receive", "text": json.dumps(payload)})
+
+    async def receive_json(self) -> Optional[dict]:
+        # None once the server closes the socket
+        message = await self.outbound.get()
+        if message["type"] == "websocket.close":
+            return None
+        return json.loads(message.get("text") or message.get("bytes"))
+
+    async def close(self):
+        await self.inbound.put({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+async def run_websocket(app, client, tokens: Dict[int, str], data: Dataset, prefix: str, args, rng: random.Random) -> dict:
+    users = [user_id for user_id in data.user_ids if user_id in data.conversations_by_user][:args.ws_clients]
+    online = set(users)
+    # Conversations whose recipient is listening, with the sender to post as
+    routes = [
+        (conversation_id, sender_id)
+        for conversation_id, user1_id, user2_id in data.conversations
+        for sender_id, recipient_id in ((user1_id, user2_id), (user2_id, user1_id))
+        if recipient_id in online
+    ]
+
+    sockets = []
+    for user_id in users:
+        socket = WebSocketClient(app, f"{prefix}/ws/messages/{user_id}")
+        await socket.connect()
+        await socket.send_json({"type": "auth", "token": tokens[user_id]})
+        sockets.append(socket)
+
+    pending: Dict[str, float] = {}
+    latencies = []
+    delivered = asyncio.Event()
+    sending = True
+
+    async def read(socket: WebSocketClient):
+        while True:
+            frame = await socket.receive_json()
+            if frame is None:
+                return
+            if frame.get("type") == "ping":
+                await socket.send_json({"type": "pong"})
+            elif frame.get("type") == "new_message":
+                started = pending.pop(frame["message"]["content"], None)
+                if started is not None:
+                    latencies.append(time.perf_counter() - started)
+                if not sending and not pending:
+                    delivered.set()
+
+    readers = [asyncio.create_task(read(socket)) for socket in sockets]
+    tickets = iter(range(args.ws_messages))
+    errors = 0
+
+    async def sender():
+        nonlocal errors
+        for i in tickets:
+            conversation_id, sender_id = rng.choice(routes)
+            content = f"bench {i} {rng.random()}"
+            pending[content] = time.perf_counter()
+            response = await client.post(
+                f"{prefix}/conversations/{conversation_id}/messages",
+                json={"content": content},
+                headers={"Authorization": f"Bearer {tokens[sender_id]}"}
+            )
+            if response.status_code >= 400:
+                pending.pop(content, None)
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(args.concurrency)))
+    sending = False
+    if pending:
+        await asyncio.wait([asyncio.create_task(delivered.wait())], timeout=args.ws_timeout)
+    elapsed = time.perf_counter() - started
+
+    for socket in sockets:
+        await socket.close()
+    for reader in readers:
+        reader.cancel()
+    # Messages that never arrived count as errors
+    return summarize(latencies, errors + len(pending), elapsed)
+
+
+async def run_benchmarks(args, data: Dataset) -> Dict[str, dict]:
+    import httpx
+    from jose import jwt
+
+    from app.core.config import settings
+
+    app = build_app()
+    rng = random.Random(args.seed)
+    prefix = settings.API_V1_STR
+    expires = datetime.utcnow() + timedelta(hours=6)
+    tokens = {
+        user_id: jwt.encode({"sub": str(user_id), "exp": expires}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        for user_id in data.user_ids
+    }
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, make_request in http_scenarios(data, prefix, rng):
+                if args.only and args.only not in name:
+                    continue
+                # Untimed warmup: connections and caches
+                await run_http(client, tokens, make_request, args.concurrency, args.concurrency)
+                results[name] = await run_http(client, tokens, make_request, args.requests, args.concurrency)
+                print_result(name, results[name])
+            name = "WS new_message delivery"
+            if args.ws_clients > 0 and (not args.only or args.only in name):
+                results[name] = await run_websocket(app, client, tokens, data, prefix, args, rng)
+                print_result(name, results[name])
+    return results
+
+
+def print_header():
+    print(f"{'endpoint':<36}{'reqs':>7}{'errors':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+
+
+def print_result(name: str, result: dict):
+    print(
+        f"{name:<36}{result['requests']:>7}{result['errors']:>7}{result['throughput']:>9.1f}"
+        f"{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+    )
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """
+    Print how each endpoint moved against the baseline; returns a line per
+    regression beyond `threshold` (a fraction)
+    """
+    regressions = []
+    print(f"{'endpoint':<36}{'metric':>12}{'baseline':>11}{'current':>11}{'change':>9}")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        for metric, worse_when_higher in [(key, True) for key, _ in PERCENTILES] + [("throughput", False)]:
+            old, new = before[metric], result[metric]
+            change = (new - old) / old if old else 0.0
+            regressed = change > threshold if worse_when_higher else change < -threshold
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<36}{metric:>12}{old:>11.2f}{new:>11.2f}{change:>+8.0%}{flag}")
+            if regressed:
+                regressions.append(f"{name} {metric} {old:.2f} -> {new:.2f} ({change:+.0%})")
+    print(f"{len(regressions)} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+
+def load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def run(args) -> int:
+    with tempfile.TemporaryDirectory() as scratch:
+        configure_environment(args, scratch)
+        # Contended writes are the point of the run; the percentiles already report them
+        logging.getLogger("app.sql.slow").setLevel(logging.ERROR)
+        started = time.perf_counter()
+        data = seed(args)
+        print(
+            f"seeded {args.users} users, {len(data.conversations)} conversations, {args.messages} messages, "
+            f"{args.notifications} notifications in {time.perf_counter() - started:.1f}s"
+        )
+
+        from app.db.base import engine
+
+        print_header()
+        results = asyncio.run(run_benchmarks(args, data))
+        report = {
+            "meta": {
+                "created_at": datetime.utcnow().isoformat(),
+                "python": platform.python_version(),
+                "database": engine.dialect.name,
+                "settings": {key: getattr(args, key) for key in (
+                    "users", "conversations", "messages", "notifications",
+                    "requests", "concurrency", "ws_clients", "ws_messages", "seed"
+                )},
+            },
+            "results": results,
+        }
+        engine.dispose()
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"saved {args.save}")
+    if args.baseline:
+        print()
+        regressions = compare(load(args.baseline), report, args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+async def probe(args) -> dict:
+    """
+    One cold start, run in a fresh process by `coldstart`: import and
+    start the app, then time rounds of list requests as one user
+    """
+    import httpx
+    from jose import jwt
+
+    from app.core.config import settings
+
+    app = build_app()
+    imported = time.time()
+    prefix = settings.API_V1_STR
+    token = jwt.encode(
+        {"sub": str(args.user_id), "exp": datetime.utcnow() + timedelta(hours=1)},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM
+    )
+    paths = [
+        f"{prefix}/conversations",
+        f"{prefix}/conversations/{args.conversation_id}/messages",
+        f"{prefix}/notifications",
+        f"{prefix}/notifications/unread-count",
+    ]
+
+    # (latency, wall clock time at the end) per round
+    rounds = []
+    async with app.router.lifespan_context(app):
+        started = time.time()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for _ in range(args.rounds):
+                round_started = time.perf_counter()
+                for path in paths:
+                    response = await client.get(path, headers={"Authorization": f"Bearer {token}"})
+                    if response.status_code >= 400:
+                        raise RuntimeError(f"GET {path} returned {response.status_code}")
+                rounds.append((time.perf_counter() - round_started, time.time()))
+
+    latencies = [latency for latency, _ in rounds]
+    steady = statistics.median(latencies[len(latencies) // 2:])
+    first_fast = next(i for i, latency in enumerate(latencies) if latency <= FAST_FACTOR * steady)
+    return {
+        "import_ms": (imported - args.spawned_at) * 1000,
+        "startup_ms": (started - imported) * 1000,
+        "first_round_ms": latencies[0] * 1000,
+        "steady_round_ms": steady * 1000,
+        "fast_round": first_fast + 1,
+        "cold_start_ms": (rounds[first_fast][1] - args.spawned_at) * 1000,
+    }
+
+
+def cold_start(args) -> int:
+    with tempfile.TemporaryDirectory() as scratch:
+        configure_environment(args, scratch)
+        data = seed(args)
+
+        from app.db.base import engine
+
+        engine.dispose()
+        conversation_id, user_id, _ = data.conversations[0]
+        results = {False: [], True: []}
+        for _ in range(args.runs):
+            # Alternate so both modes see the same OS caches
+            for warmup in (False, True):
+                command = [
+                    sys.executable, "-m", "app.tools.api_bench", "probe",
+                    "--user-id", str(user_id),
+                    "--conversation-id", str(conversation_id),
+                    "--rounds", str(args.rounds),
+                    "--spawned-at", repr(time.time()),
+                ]
+                env = dict(os.environ, DB_WARMUP="true" if warmup else "false")
+                output = subprocess.run(command, env=env, stdout=subprocess.PIPE, universal_newlines=True, check=True)
+                results[warmup].append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    print(f"median of {args.runs} runs, {args.rounds} rounds of 4 requests each")
+    print(f"{'warmup':<8}{'import ms':>11}{'startup ms':>12}{'1st round ms':>14}{'steady ms':>11}{'fast at':>9}{'cold start ms':>15}")
+    for warmup, runs in results.items():
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(
+            f"{'on' if warmup else 'off':<8}{median['import_ms']:>11.0f}{median['startup_ms']:>12.0f}"
+            f"{median['first_round_ms']:>14.1f}{median['steady_round_ms']:>11.1f}"
+            f"{median['fast_round']:>9.0f}{median['cold_start_ms']:>15.0f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # Options of the seeded data, shared by run and coldstart
+    data_parser = argparse.ArgumentParser(add_help=False)
+    data_parser.add_argument("--database-url", help="empty database to seed instead of a scratch SQLite file")
+    data_parser.add_argument("--users", type=int, default=200)
+    data_parser.add_argument("--conversations", type=int, default=1000)
+    data_parser.add_argument("--messages", type=int, default=20000)
+    data_parser.add_argument("--notifications", type=int, default=20000)
+    data_parser.add_argument("--seed", type=int, default=1, help="random seed for data and requests")
+
+    run_parser = commands.add_parser("run", parents=[data_parser], help="seed a database and benchmark the API")
+    run_parser.add_argument("--requests", type=int, default=500, help="timed requests per endpoint")
+    run_parser.add_argument("--concurrency", type=int, default=20, help="concurrent clients")
+    run_parser.add_argument("--ws-clients", type=int, default=100, help="open websockets, 0 skips delivery")
+    run_parser.add_argument("--ws-messages", type=int, default=500, help="messages sent to websocket clients")
+    run_parser.add_argument("--ws-timeout", type=float, default=30.0, help="seconds to wait for deliveries")
+    run_parser.add_argument("--only", help="run only endpoints whose name contains this")
+    run_parser.add_argument("--save", help="write the results as a JSON baseline")
+    run_parser.add_argument("--baseline", help="compare against this saved baseline")
+    run_parser.add_argument("--threshold", type=float, default=0.1, help="allowed change before flagging, 0.1 = 10%%")
+
+    compare_parser = commands.add_parser("compare", help="compare two saved results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="allowed change before flagging, 0.1 = 10%%")
+
+    cold_parser = commands.add_parser("coldstart", parents=[data_parser], help="time new workers with and without warmup")
+    cold_parser.add_argument("--runs", type=int, default=3, help="processes started per mode")
+    cold_parser.add_argument("--rounds", type=int, default=50, help="request rounds per process")
+
+    probe_parser = commands.add_parser("probe", help="one coldstart process (internal)")
+    probe_parser.add_argument("--user-id", type=int, required=True)
+    probe_parser.add_argument("--conversation-id", type=int, required=True)
+    probe_parser.add_argument("--rounds", type=int, default=50)
+    probe_parser.add_argument("--spawned-at", type=float, required=True, help="time.time() when the process was started")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        sys.exit(1 if compare(load(args.baseline), load(args.current), args.threshold) else 0)
+    if args.command == "coldstart":
+        sys.exit(cold_start(args))
+    if args.command == "probe":
+        print(json.dumps(asyncio.run(probe(args))))
+        sys.exit(0)
+    sys.exit(run(args))
@@ -0,0 +1,109 @@
+"""
+Compare the cost of serving a page of notifications through response_model
+with the row-projection fast path, per 1,000 rows.
+
+    python -m app.tools.serialization_bench --rows 1000 --repeat 50
+
+"response_model" loads Notification objects and does what FastAPI does
+with a returned value: validate it against NotificationPage, dump it in
+JSON mode and encode it with the stdlib json module. "fast path" selects
+the response columns as plain rows, zips them into dicts and encodes
+them with dump_json (orjson when installed), as get_notifications does.
+Both run against a scratch SQLite database, so the load figures include a
+real query.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.api.notifications import NOTIFICATION_FIELDS
+from app.core.responses import dump_json, orjson, rows_as_dicts
+from app.db.base_class import Base
+from app.models import Notification, User
+from app.schemas.notification import NotificationPage
+
+
+def prepare(database_url: str, rows: int) -> sessionmaker:
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine, tables=[User.__table__, Notification.__table__])
+    factory = sessionmaker(bind=engine, autoflush=False)
+    started = datetime(2024, 3, 21, 13, 0, 0)
+    with factory() as db:
+        db.add(User(id=1, email="bench@example.org", hashed_password="x"))
+        db.add_all([
+            Notification(
+                user_id=1,
+                type="message",
+                message=f"New message from user {i % 50}",
+                data={"conversation_id": i % 50, "sender_id": i % 50 + 1},
+                read=i % 3 == 0,
+                created_at=started + timedelta(seconds=i)
+            )
+            for i in range(rows)
+        ])
+        db.commit()
+    return factory
+
+
+def response_model_path(factory: sessionmaker, rows: int, adapter: TypeAdapter):
+    started = time.perf_counter()
+    with factory() as db:
+        notifications = db.execute(select(Notification).limit(rows)).scalars().all()
+        loaded = time.perf_counter()
+        page = adapter.validate_python({"items": notifications, "next_cursor": None}, from_attributes=True)
+        body = json.dumps(
+            adapter.dump_python(page, mode="json"), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+    return loaded - started, time.perf_counter() - loaded, len(body)
+
+
+def fast_path(factory: sessionmaker, rows: int):
+    started = time.perf_counter()
+    with factory() as db:
+        notifications = rows_as_dicts(db.execute(select(*NOTIFICATION_FIELDS).limit(rows)))
+        loaded = time.perf_counter()
+        body = dump_json({"items": notifications, "next_cursor": None})
+    return loaded - started, time.perf_counter() - loaded, len(body)
+
+
+def main(rows: int, repeat: int):
+    adapter = TypeAdapter(NotificationPage)
+    with tempfile.TemporaryDirectory() as scratch:
+        factory = prepare(f"sqlite:///{os.path.join(scratch, 'bench.db')}", rows)
+        modes = [
+            ("response_model", lambda: response_model_path(factory, rows, adapter)),
+            ("fast path", lambda: fast_path(factory, rows)),
+        ]
+        print(f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}, {rows} rows")
+        print(f"{'mode':<16}{'load ms/1k':>12}{'encode ms/1k':>14}{'total ms/1k':>13}{'bytes':>10}")
+        baseline = None
+        for name, run in modes:
+            run()  # warm up statement caches and the adapter
+            load = encode = 0.0
+            for _ in range(repeat):
+                load_time, encode_time, size = run()
+                load += load_time
+                encode += encode_time
+            per_k = 1000 / rows / repeat * 1000
+            total = (load + encode) * per_k
+            baseline = baseline or total
+            print(
+                f"{name:<16}{load * per_k:>12.2f}{encode * per_k:>14.2f}{total:>13.2f}{size:>10}"
+                f"  {baseline / total:.1f}x"
+            )
+        factory.kw["bind"].dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,80 @@
+"""
+Measure server CPU time per delivered websocket event for each delivery
+mode: one JSON frame per event, batched frames, and msgpack encoding.
+
+    python -m app.tools.ws_bench --events 20000 --burst 20
+
+Events go through a real Connection writer into a Starlette WebSocket
+whose transport discards frames, so the figures cover encoding and the
+ASGI send path but not the socket write or permessage-deflate, which
+the server (uvicorn) performs.
+"""
+import argparse
+import asyncio
+import time
+
+from starlette.websockets import WebSocket
+
+from app.core.websocket import ENCODERS, Connection
+
+SAMPLE_EVENT = {
+    "type": "new_message",
+    "data": {
+        "id": 1,
+        "conversation_id": 42,
+        "sender_id": 7,
+        "content": "The levee survey results are in, see the attached report for details.",
+        "read": False,
+        "created_at": "2024-03-21T13:00:00",
+    },
+}
+
+
+async def discarding_websocket() -> WebSocket:
+    async def receive():
+        return {"type": "websocket.connect"}
+
+    async def send(message):
+        pass
+
+    websocket = WebSocket({"type": "websocket", "path": "/", "headers": []}, receive, send)
+    await websocket.accept()
+    return websocket
+
+
+async def measure(events: int, burst: int, batch_size: int, batch_delay: float, encoding: str) -> float:
+    connection = Connection(
+        0, await discarding_websocket(), max_queue=events, policy="drop_oldest", send_timeout=10.0,
+        on_close=lambda connection: None, batch_size=batch_size, batch_delay=batch_delay, encoding=encoding
+    )
+    started = time.process_time()
+    for i in range(events):
+        connection.enqueue(dict(SAMPLE_EVENT, seq=i))
+        if i % burst == burst - 1:
+            # Let the writer run between bursts, as between incoming requests
+            await asyncio.sleep(0)
+    while connection.queue:
+        await asyncio.sleep(batch_delay)
+    elapsed = time.process_time() - started
+    await connection.close()
+    return elapsed / events
+
+
+async def main(events: int, burst: int, batch_size: int, batch_delay: float):
+    modes = [(encoding, size) for encoding in ENCODERS for size in (1, batch_size)]
+    baseline = None
+    print(f"{'encoding':<10}{'batch':>6}{'us/event':>12}{'vs json':>10}")
+    for encoding, size in modes:
+        per_event = await measure(events, burst, size, batch_delay, encoding)
+        baseline = baseline or per_event
+        print(f"{encoding:<10}{size:>6}{per_event * 1e6:>12.2f}{per_event / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--burst", type=int, default=20, help="events enqueued between writer turns")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--batch-delay", type=float, default=0.005)
+    args = parser.parse_args()
+    asyncio.run(main(args.events, args.burst, args.batch_size, args.batch_delay))
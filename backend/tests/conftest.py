@@ -0,0 +1,98 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+# Settings are read when app modules are first imported
+_scratch = tempfile.mkdtemp(prefix="gsp-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ["SEARCH_INDEX_PATH"] = os.path.join(_scratch, "search_index.json")
+os.environ["NOTIFICATION_PURGE_INTERVAL"] = "0"
+os.environ["DB_WARMUP"] = "false"
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app.core.auth import token_cache
+from app.core.config import settings
+from app.db.base import SessionLocal, engine
+from app.db.base_class import Base
+from app.models import Conversation, Message, User
+
+
+@pytest.fixture(autouse=True)
+def database():
+    Base.metadata.create_all(engine)
+    yield
+    token_cache.clear()
+    engine.dispose()
+    Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def counted_engine():
+    # Requests run on the async engine in DB_ENGINE_MODE=async
+    from app.db.session import async_engine
+    return async_engine.sync_engine if async_engine is not None else engine
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def make_user(db, user_id: int, **values) -> User:
+    user = User(id=user_id, email=f"user{user_id}@example.org", hashed_password="x", **values)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def make_conversation(db, conversation_id: int, user1_id: int, user2_id: int, messages: int = 0) -> Conversation:
+    started = datetime(2024, 1, 1)
+    conversation = Conversation(id=conversation_id, user1_id=user1_id, user2_id=user2_id, updated_at=started)
+    db.add(conversation)
+    for i in range(messages):
+        db.add(Message(
+            conversation_id=conversation_id,
+            sender_id=(user1_id, user2_id)[i % 2],
+            content=f"message {i}",
+            read=False,
+            created_at=started + timedelta(seconds=i)
+        ))
+    db.commit()
+    return conversation
+
+
+def token_for(user_id: int) -> str:
+    claims = {"sub": str(user_id), "exp": datetime.utcnow() + timedelta(hours=1)}
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def auth_headers(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {token_for(user_id)}"}
+
+
+@pytest.fixture
+def client():
+    """
+    The messaging, notification and presence routers, mounted and started
+    as app.main mounts and starts them
+    """
+    from app.api import messages, notifications, presence
+    from app.core.lifecycle import register_lifecycle
+    from app.core.responses import FastJSONResponse
+    from app.core.sql_stats import SQLStatsMiddleware
+
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.add_middleware(SQLStatsMiddleware)
+    for module in (notifications, messages, presence):
+        app.include_router(module.router, prefix=settings.API_V1_STR)
+    register_lifecycle(app)
+    with TestClient(app) as test_client:
+        yield test_client
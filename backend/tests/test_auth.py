@@ -0,0 +1,97 @@
+import asyncio
+
+from app.core import auth
+from app.core.auth import authenticate_token, invalidate_on_commit, token_cache
+
+from conftest import make_user, token_for
+
+
+def authenticate(token: str):
+    return asyncio.run(authenticate_token(token))
+
+
+def test_deactivation_drops_cached_tokens_on_commit(db):
+    user = make_user(db, 1)
+    token = token_for(1)
+    assert authenticate(token).id == 1
+    assert token_cache.get(token) is not None
+
+    user.is_active = False
+    db.flush()
+    # Not committed yet: other requests still see the active row
+    assert token_cache.get(token) is not None
+
+    db.commit()
+    assert token_cache.get(token) is None
+    assert authenticate(token) is None
+
+
+def test_rolled_back_change_keeps_cached_tokens(db):
+    user = make_user(db, 1)
+    token = token_for(1)
+    authenticate(token)
+
+    user.is_active = False
+    db.flush()
+    db.rollback()
+    assert token_cache.get(token) is not None
+    assert authenticate(token).id == 1
+
+
+def test_deleted_user_is_dropped(db):
+    user = make_user(db, 1)
+    token = token_for(1)
+    authenticate(token)
+
+    db.delete(user)
+    db.commit()
+    assert token_cache.get(token) is None
+    assert authenticate(token) is None
+
+
+def test_core_update_invalidates_explicitly(db):
+    from sqlalchemy import update
+
+    from app.models import User
+
+    make_user(db, 1)
+    token = token_for(1)
+    authenticate(token)
+
+    db.execute(update(User).where(User.id == 1).values(is_active=False))
+    invalidate_on_commit(db, [1])
+    assert token_cache.get(token) is not None
+    db.commit()
+    assert authenticate(token) is None
+
+
+def test_row_loaded_before_a_committed_deactivation_is_not_cached(db, monkeypatch):
+    user = make_user(db, 1)
+    token = token_for(1)
+    new_session = auth.new_session
+
+    class RacingSession:
+        """
+        Loads the user, then lets another request deactivate them and
+        commit before the load returns
+        """
+
+        def __init__(self):
+            self.session = new_session()
+
+        async def get(self, model, ident):
+            loaded = await self.session.get(model, ident)
+            user.is_active = False
+            db.commit()
+            return loaded
+
+        async def close(self):
+            await self.session.close()
+
+    monkeypatch.setattr(auth, "new_session", RacingSession)
+    # The request in flight still answers from the row it read
+    assert authenticate(token).id == 1
+    monkeypatch.undo()
+
+    assert token_cache.get(token) is None
+    assert authenticate(token) is None
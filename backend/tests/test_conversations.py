@@ -0,0 +1,149 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.db.query_counter import QueryCounter
+from app.models import Conversation, Message
+
+from conftest import auth_headers, make_conversation, make_user
+
+API = settings.API_V1_STR
+
+
+@pytest.fixture
+def headers():
+    return auth_headers(1)
+
+
+def test_pages_through_conversations_without_updated_at(client, db, headers):
+    for user_id in range(1, 6):
+        make_user(db, user_id)
+    make_conversation(db, 1, 1, 2)
+    make_conversation(db, 2, 1, 3)
+    # Written outside the ORM, so the column default never ran
+    db.execute(insert(Conversation.__table__), [
+        {"id": 3, "user1_id": 1, "user2_id": 4, "updated_at": None},
+        {"id": 4, "user1_id": 5, "user2_id": 1, "updated_at": None},
+    ])
+    db.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 1}
+        if cursor:
+            params["before"] = cursor
+        response = client.get(f"{API}/conversations", params=params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [2, 1, 4, 3]
+
+
+def test_unchanged_list_is_not_modified_until_a_new_message(client, db, headers):
+    make_user(db, 1)
+    make_user(db, 2)
+    make_conversation(db, 1, 1, 2, messages=3)
+    first = client.get(f"{API}/conversations", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "Authorization" in first.headers["Vary"]
+
+    cached = client.get(f"{API}/conversations", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+    sent = client.post(f"{API}/conversations/1/messages", json={"content": "hello"}, headers=auth_headers(2))
+    assert sent.status_code == 200
+
+    fresh = client.get(f"{API}/conversations", headers={**headers, "If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert fresh.json()["items"][0]["last_message"]["content"] == "hello"
+
+
+def history_with_ties(db) -> list:
+    make_user(db, 1)
+    make_user(db, 2)
+    make_conversation(db, 1, 1, 2)
+    # Three messages share each second, so only the id tells them apart
+    for i in range(7):
+        db.add(Message(conversation_id=1, sender_id=1 + i % 2, content=f"m {i}", read=False,
+                       created_at=datetime(2024, 2, 1, 12, 0, i // 3)))
+    db.commit()
+    return [message.id for message in db.query(Message).order_by(Message.id)]
+
+
+def test_message_history_pages_back_through_ties(client, db, headers):
+    ids = history_with_ties(db)
+    url = f"{API}/conversations/1/messages"
+
+    pages = [client.get(url, params={"limit": 2}, headers=headers).json()]
+    while pages[-1]["prev_cursor"]:
+        pages.append(client.get(url, params={"limit": 2, "before": pages[-1]["prev_cursor"]}, headers=headers).json())
+
+    assert [[item["id"] for item in page["items"]] for page in pages] == [ids[5:], ids[3:5], ids[1:3], ids[:1]]
+    # Every older page points back to the newer messages
+    assert pages[0]["next_cursor"] is None
+    assert all(page["next_cursor"] for page in pages[1:])
+
+
+def test_message_history_pages_forward_through_ties(client, db, headers):
+    ids = history_with_ties(db)
+    url = f"{API}/conversations/1/messages"
+    latest = client.get(url, params={"limit": 6}, headers=headers).json()
+    oldest = client.get(url, params={"limit": 1, "before": latest["prev_cursor"]}, headers=headers).json()
+    assert [item["id"] for item in oldest["items"]] == ids[:1]
+    assert oldest["prev_cursor"] is None
+
+    seen = [item["id"] for item in oldest["items"]]
+    cursor = oldest["next_cursor"]
+    while cursor:
+        page = client.get(url, params={"limit": 2, "after": cursor}, headers=headers).json()
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+
+    assert seen == ids
+
+
+def test_message_history_rejects_bad_cursors(client, db, headers):
+    history_with_ties(db)
+    url = f"{API}/conversations/1/messages"
+    cursor = client.get(url, params={"limit": 2}, headers=headers).json()["prev_cursor"]
+
+    assert client.get(url, params={"before": cursor, "after": cursor}, headers=headers).status_code == 400
+    assert client.get(url, params={"before": "nonsense"}, headers=headers).status_code == 400
+
+
+def unread_counts(client, user_id: int) -> dict:
+    items = client.get(f"{API}/conversations", headers=auth_headers(user_id)).json()["items"]
+    return {item["id"]: item["unread_count"] for item in items}
+
+
+def test_mark_read_moves_only_the_readers_watermark(client, db, headers, counted_engine):
+    make_user(db, 1)
+    make_user(db, 2)
+    # Senders alternate 1, 2, 1, 2
+    make_conversation(db, 1, 1, 2, messages=4)
+    assert unread_counts(client, 1) == unread_counts(client, 2) == {1: 2}
+
+    with QueryCounter(counted_engine) as counter:
+        assert client.post(f"{API}/conversations/1/read", headers=headers).status_code == 200
+
+    # One single-row update; message rows are never written
+    writes = [sql for sql in counter.statements if sql.lstrip().split()[0].upper() in ("UPDATE", "INSERT", "DELETE")]
+    assert len(writes) == 1 and writes[0].lstrip().upper().startswith("UPDATE CONVERSATIONS"), writes
+    assert unread_counts(client, 1) == {1: 0}
+    assert unread_counts(client, 2) == {1: 2}
+    items = client.get(f"{API}/conversations/1/messages", headers=auth_headers(2)).json()["items"]
+    assert [(item["sender_id"], item["read"]) for item in items] == [(1, False), (2, True), (1, False), (2, True)]
+
+    client.post(f"{API}/conversations/1/messages", json={"content": "again"}, headers=auth_headers(2))
+    assert unread_counts(client, 1) == {1: 1}
@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.base import engine
+from app.db.base_class import Base
+from app.models import Notification
+from app.tools import dataio
+
+from conftest import make_conversation, make_user
+
+
+@pytest.fixture
+def seeded(db):
+    for user_id in range(1, 4):
+        make_user(db, user_id)
+    make_conversation(db, 1, 1, 2, messages=5)
+    make_conversation(db, 2, 3, 1, messages=2)
+    db.add(Notification(user_id=1, type="t", message="one", data={"k": [1, 2]}, read=False))
+    db.add(Notification(user_id=2, type="t", message="two", read=True))
+    db.commit()
+
+
+def snapshot() -> dict:
+    with engine.connect() as connection:
+        return {
+            name: [dict(row._mapping) for row in connection.execute(select(model.__table__).order_by(model.id))]
+            for name, model in dataio.TABLES.items()
+        }
+
+
+def empty_database():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+
+def test_export_import_round_trip(seeded, tmp_path):
+    before = snapshot()
+    tables = list(dataio.TABLES)
+    dataio.export_all(str(tmp_path), tables, batch_size=2)
+    empty_database()
+
+    dataio.import_all(str(tmp_path), tables, 3, str(tmp_path / "import.checkpoint.json"), restart=False)
+
+    assert snapshot() == before
+
+
+def test_interrupted_import_resumes_from_checkpoint(seeded, tmp_path, monkeypatch, capsys):
+    before = snapshot()
+    tables = list(dataio.TABLES)
+    checkpoint_path = str(tmp_path / "import.checkpoint.json")
+    dataio.export_all(str(tmp_path), tables, batch_size=100)
+    empty_database()
+
+    commit = Session.commit
+    commits = []
+
+    def interrupted(self):
+        # Users, conversations and the first chunk of messages go through
+        commits.append(self)
+        if len(commits) == 4:
+            raise KeyboardInterrupt
+        commit(self)
+
+    monkeypatch.setattr(Session, "commit", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        dataio.import_all(str(tmp_path), tables, 3, checkpoint_path, restart=False)
+    monkeypatch.undo()
+    assert len(snapshot()["messages"]) == 3
+
+    dataio.import_all(str(tmp_path), tables, 3, checkpoint_path, restart=False)
+
+    output = capsys.readouterr().out
+    assert "users: already imported (3 rows)" in output
+    assert "messages: resuming after 3 rows" in output
+    assert snapshot() == before
+
+
+def test_resume_after_a_crash_between_commit_and_checkpoint(seeded, tmp_path, monkeypatch, capsys):
+    before = snapshot()
+    tables = list(dataio.TABLES)
+    checkpoint_path = str(tmp_path / "import.checkpoint.json")
+    dataio.export_all(str(tmp_path), tables, batch_size=100)
+    empty_database()
+
+    save = dataio.Checkpoint.save
+
+    def crash(self, name, offset, rows, done=False):
+        # The first messages chunk is committed, then the process dies
+        if name == "messages":
+            raise KeyboardInterrupt
+        save(self, name, offset, rows, done)
+
+    monkeypatch.setattr(dataio.Checkpoint, "save", crash)
+    with pytest.raises(KeyboardInterrupt):
+        dataio.import_all(str(tmp_path), tables, 3, checkpoint_path, restart=False)
+    monkeypatch.undo()
+    assert len(snapshot()["messages"]) == 3
+
+    dataio.import_all(str(tmp_path), tables, 3, checkpoint_path, restart=False)
+
+    assert "messages: skipped 3 rows already in the database" in capsys.readouterr().out
+    assert snapshot() == before
@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+from app.core.message_bus import MessageBus, RedisMessageBus
+
+
+class FakePubSub:
+    def __init__(self, messages, error=None):
+        self.messages = messages
+        self.error = error
+        self.closed = False
+
+    async def psubscribe(self, pattern):
+        self.pattern = pattern
+
+    async def listen(self):
+        for message in self.messages:
+            yield message
+        if self.error is not None:
+            raise self.error
+        await asyncio.Event().wait()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeRedis:
+    def __init__(self, *subscriptions):
+        self.subscriptions = list(subscriptions)
+
+    def pubsub(self):
+        return self.subscriptions.pop(0)
+
+
+def pmessage(channel: str, data) -> dict:
+    return {"type": "pmessage", "channel": f"t:{channel}".encode(), "data": data}
+
+
+def redis_bus(client) -> RedisMessageBus:
+    # The redis package isn't needed to drive the reader with a fake client
+    bus = RedisMessageBus.__new__(RedisMessageBus)
+    MessageBus.__init__(bus)
+    bus.client = client
+    bus.errors = (ConnectionError, OSError)
+    bus.prefix = "t:"
+    bus.pubsub = None
+    bus.reader = None
+    bus.reconnect_delay = 0.001
+    return bus
+
+
+def test_reader_survives_a_dropped_connection_and_bad_payloads():
+    first = FakePubSub(
+        [{"type": "psubscribe"}, pmessage("a", b"not json"), pmessage("a", json.dumps({"n": 1}))],
+        error=ConnectionError("connection reset")
+    )
+    second = FakePubSub([pmessage("a", json.dumps({"n": 2})), pmessage("a", json.dumps({"n": 3}))])
+    bus = redis_bus(FakeRedis(first, second))
+    received = []
+    bus.subscribe("a", received.append)
+    bus.subscribe("a", lambda payload: 1 / 0)
+
+    async def run():
+        await bus.start()
+        for _ in range(100):
+            if len(received) == 3:
+                break
+            await asyncio.sleep(0.005)
+        await bus.stop()
+
+    asyncio.run(run())
+    assert received == [{"n": 1}, {"n": 2}, {"n": 3}]
+    assert first.closed and second.closed
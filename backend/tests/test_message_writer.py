@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from app.core.message_writer import GroupCommitWriter
+from app.db.session import new_session
+from app.models import Message
+
+from conftest import make_conversation, make_user
+
+
+@pytest.fixture
+def conversation(db):
+    make_user(db, 1)
+    make_user(db, 2)
+    return make_conversation(db, 1, 1, 2)
+
+
+def stored_contents(db):
+    db.expire_all()
+    return sorted(db.scalars(select(Message.content)))
+
+
+def test_failed_batch_only_fails_the_offending_message(db, conversation):
+    writer = GroupCommitWriter(max_batch=3, max_delay=1.0)
+
+    async def send():
+        now = datetime.utcnow()
+        # content is NOT NULL: the middle message breaks the batch's INSERT
+        results = await asyncio.gather(
+            writer.submit(1, 1, "first", now),
+            writer.submit(1, 2, None, now),
+            writer.submit(1, 1, "third", now),
+            return_exceptions=True
+        )
+        await writer.stop()
+        return results
+
+    first, failed, third = asyncio.run(send())
+    assert first.id is not None and first.content == "first"
+    assert isinstance(failed, Exception)
+    assert third.id is not None and third.content == "third"
+    assert stored_contents(db) == ["first", "third"]
+
+
+def test_flusher_survives_a_session_that_cannot_be_opened(db, conversation):
+    calls = []
+
+    def session_factory():
+        calls.append(None)
+        if len(calls) == 1:
+            raise RuntimeError("no connection")
+        return new_session()
+
+    writer = GroupCommitWriter(max_batch=1, max_delay=0.01, session_factory=session_factory)
+
+    async def send():
+        with pytest.raises(RuntimeError, match="no connection"):
+            await writer.submit(1, 1, "lost", datetime.utcnow())
+        stored = await writer.submit(1, 1, "kept", datetime.utcnow())
+        await writer.stop()
+        return stored
+
+    assert asyncio.run(send()).content == "kept"
+    assert stored_contents(db) == ["kept"]
+
+
+def test_stop_writes_queued_messages(db, conversation):
+    # A batch that would otherwise wait a minute to fill
+    writer = GroupCommitWriter(max_batch=100, max_delay=60.0)
+
+    async def send():
+        submitted = [
+            asyncio.ensure_future(writer.submit(1, 1, f"queued {i}", datetime.utcnow()))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0)
+        await writer.stop()
+        return await asyncio.gather(*submitted)
+
+    assert [message.content for message in asyncio.run(send())] == ["queued 0", "queued 1", "queued 2"]
+    assert stored_contents(db) == ["queued 0", "queued 1", "queued 2"]
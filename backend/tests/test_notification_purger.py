@@ -0,0 +1,71 @@
+import asyncio
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import Settings, settings
+from app.core.notification_purger import NotificationPurger, create_notification_purger
+from app.models import Notification, User
+
+from conftest import make_user
+
+
+@pytest.fixture
+def expired(db):
+    make_user(db, 1, unread_notification_count=2)
+    old = datetime.utcnow() - timedelta(days=400)
+    for i in range(5):
+        db.add(Notification(user_id=1, type="t", message=f"old {i}", read=i >= 2, created_at=old))
+    db.commit()
+
+
+def purger(archive_path) -> NotificationPurger:
+    return NotificationPurger(timedelta(days=180), None, 0, 3, 0.0, "ndjson", str(archive_path))
+
+
+def archived(archive_path) -> list:
+    records = []
+    for name in sorted(os.listdir(archive_path)):
+        with gzip.open(os.path.join(archive_path, name), "rt", encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+def test_ndjson_archive_holds_each_deleted_row_once(db, expired, tmp_path):
+    assert asyncio.run(purger(tmp_path).purge()) == 5
+
+    assert sorted(record["message"] for record in archived(tmp_path)) == [f"old {i}" for i in range(5)]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    assert db.scalar(select(func.count()).select_from(Notification)) == 0
+    assert db.get(User, 1).unread_notification_count == 0
+
+
+def test_failed_commit_leaves_no_archive(db, expired, tmp_path, monkeypatch):
+    def fail(self):
+        raise RuntimeError("lost connection")
+
+    monkeypatch.setattr(Session, "commit", fail)
+    with pytest.raises(RuntimeError):
+        asyncio.run(purger(tmp_path).purge())
+    monkeypatch.undo()
+    assert os.listdir(tmp_path) == []
+
+    # The retry archives every row exactly once
+    asyncio.run(purger(tmp_path).purge())
+    assert len(archived(tmp_path)) == 5
+
+
+def test_retention_is_off_by_default(monkeypatch):
+    for name in ("NOTIFICATION_MAX_AGE_DAYS", "NOTIFICATION_MAX_READ_PER_USER", "NOTIFICATION_PURGE_INTERVAL"):
+        monkeypatch.setattr(settings, name, Settings.model_fields[name].default)
+    assert not create_notification_purger().enabled
+
+    monkeypatch.setattr(settings, "NOTIFICATION_PURGE_INTERVAL", 3600)
+    assert not create_notification_purger().enabled
+    monkeypatch.setattr(settings, "NOTIFICATION_MAX_AGE_DAYS", 180)
+    assert create_notification_purger().enabled
@@ -0,0 +1,179 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import event, func, select
+
+from app.api.notifications import notification_service
+from app.core import notification_service as notification_service_module
+from app.core.config import settings
+from app.core.notification_service import NotificationService
+from app.db.query_counter import QueryCounter
+from app.db.session import new_session
+from app.models import Notification, User
+
+from conftest import auth_headers, make_user
+
+API = settings.API_V1_STR
+EDITED = datetime(2024, 1, 1)
+
+
+def test_clear_all_deletes_in_chunks(client, db, monkeypatch):
+    make_user(db, 1, updated_at=EDITED)
+    make_user(db, 2, unread_notification_count=1, updated_at=EDITED)
+    for i in range(7):
+        db.add(Notification(user_id=1, type="t", message=f"n {i}", read=i % 3 == 0))
+    db.add(Notification(user_id=2, type="t", message="other", read=False))
+    db.commit()
+    db.query(User).filter(User.id == 1).update({"unread_notification_count": 4, "updated_at": EDITED})
+    db.commit()
+    monkeypatch.setattr(settings, "NOTIFICATION_PURGE_BATCH_SIZE", 3)
+
+    assert client.delete(f"{API}/notifications", headers=auth_headers(1)).status_code == 200
+
+    db.expire_all()
+    remaining = db.execute(select(Notification.user_id, func.count()).group_by(Notification.user_id)).all()
+    assert remaining == [(2, 1)]
+    assert db.get(User, 1).unread_notification_count == 0
+    assert db.get(User, 2).unread_notification_count == 1
+
+
+def test_counter_updates_keep_updated_at(client, db):
+    make_user(db, 1, updated_at=EDITED)
+    db.add(Notification(user_id=1, type="t", message="n", read=False))
+    db.commit()
+    db.query(User).filter(User.id == 1).update({"unread_notification_count": 1, "updated_at": EDITED})
+    db.commit()
+
+    assert client.post(f"{API}/notifications/read-all", headers=auth_headers(1)).status_code == 200
+
+    db.expire_all()
+    user = db.get(User, 1)
+    assert user.unread_notification_count == 0
+    assert user.updated_at == EDITED
+
+
+def test_unchanged_feed_is_not_modified_until_a_new_notification(client, db):
+    make_user(db, 1)
+    make_user(db, 2, is_superuser=True)
+    headers = auth_headers(1)
+    first = client.get(f"{API}/notifications", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    cached = client.get(f"{API}/notifications", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    sent = client.post(
+        f"{API}/notifications/bulk", json={"type": "t", "message": "hello", "user_ids": [1]}, headers=auth_headers(2)
+    )
+    assert sent.status_code == 200
+
+    fresh = client.get(f"{API}/notifications", headers={**headers, "If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert [item["message"] for item in fresh.json()["items"]] == ["hello"]
+
+
+def unread(client, db, user_id: int) -> int:
+    """
+    The counter served to the badge, checked against the rows it stands for
+    """
+    count = client.get(f"{API}/notifications/unread-count", headers=auth_headers(user_id)).json()["count"]
+    stored = db.scalar(select(func.count()).select_from(Notification).where(
+        Notification.user_id == user_id, Notification.read == False  # noqa: E712
+    ))
+    assert count == stored
+    return count
+
+
+def test_unread_counter_follows_create_read_and_clear(client, db, monkeypatch):
+    make_user(db, 1)
+    make_user(db, 2, is_superuser=True)
+    admin = auth_headers(2)
+
+    def bulk(message):
+        response = client.post(f"{API}/notifications/bulk", json={"type": "t", "message": message, "user_ids": [1, 2]},
+                               headers=admin)
+        assert response.status_code == 200
+
+    async def notify():
+        session = new_session()
+        try:
+            await notification_service.notify(session, 1, "t", "direct")
+        finally:
+            await session.close()
+
+    for i in range(3):
+        bulk(f"bulk {i}")
+    asyncio.run(notify())
+    assert unread(client, db, 1) == 4
+    assert unread(client, db, 2) == 3
+
+    [first, *_] = db.scalars(select(Notification.id).where(Notification.user_id == 1).order_by(Notification.id))
+    [others] = db.scalars(select(Notification.id).where(Notification.user_id == 2).limit(1))
+    for _ in range(2):
+        assert client.post(f"{API}/notifications/{first}/read", headers=auth_headers(1)).status_code == 200
+    assert client.post(f"{API}/notifications/{others}/read", headers=auth_headers(1)).status_code == 404
+    assert unread(client, db, 1) == 3
+    assert unread(client, db, 2) == 3
+
+    assert client.post(f"{API}/notifications/read-all", headers=auth_headers(1)).status_code == 200
+    assert unread(client, db, 1) == 0
+    bulk("later")
+    assert unread(client, db, 1) == 1
+
+    monkeypatch.setattr(settings, "NOTIFICATION_PURGE_BATCH_SIZE", 2)
+    assert client.delete(f"{API}/notifications", headers=auth_headers(1)).status_code == 200
+    assert unread(client, db, 1) == 0
+    assert unread(client, db, 2) == 4
+
+
+class RecordingManager:
+    def __init__(self):
+        self.sent = []
+
+    async def send_personal_message(self, user_id: int, message: dict):
+        self.sent.append((user_id, message))
+
+
+def test_bulk_notify_inserts_in_chunks_and_pushes_the_new_ids(db, counted_engine, monkeypatch):
+    for user_id in range(1, 6):
+        make_user(db, user_id)
+    manager = RecordingManager()
+    service = NotificationService(manager, chunk_size=2)
+    monkeypatch.setattr(notification_service_module.presence, "online", lambda user_ids: list(user_ids))
+
+    async def notify_many():
+        session = new_session()
+        try:
+            count = await service.notify_many(session, [5, 4, 3, 2, 1, 3], "t", "hello", {"k": 1})
+        finally:
+            await session.close()
+        await asyncio.gather(*service.deliveries)
+        return count
+
+    chunks = []
+
+    def record(conn, clauseelement, multiparams, params, execution_options):
+        if getattr(clauseelement, "table", None) is not None and clauseelement.table.name == "notifications":
+            # A single row arrives as params rather than a list
+            chunks.append(len(multiparams) or 1)
+
+    event.listen(counted_engine, "before_execute", record)
+    try:
+        with QueryCounter(counted_engine) as counter:
+            assert asyncio.run(notify_many()) == 5
+    finally:
+        event.remove(counted_engine, "before_execute", record)
+
+    # One executemany per chunk; the driver may still split them further
+    assert chunks == [2, 2, 1]
+    inserts = [sql for sql in counter.statements if sql.lstrip().upper().startswith("INSERT INTO NOTIFICATIONS")]
+    assert inserts and all("RETURNING" in sql.upper() for sql in inserts)
+    stored = dict(db.execute(select(Notification.user_id, Notification.id)).all())
+    assert sorted(stored) == [1, 2, 3, 4, 5]
+    assert [user_id for user_id, _ in manager.sent] == [5, 4, 3, 2, 1]
+    assert {user_id: message["data"]["id"] for user_id, message in manager.sent} == stored
+    assert all(user.unread_notification_count == 1 for user in db.scalars(select(User)))
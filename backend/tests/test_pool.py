@@ -0,0 +1,37 @@
+from sqlalchemy import create_engine
+
+from app.db.pool import MeteredQueuePool, PoolMonitor
+
+
+def test_adaptive_limit_rises_under_waits_and_falls_back(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=MeteredQueuePool,
+                           pool_size=2, max_overflow=2, pool_timeout=0.1)
+    pool = engine.pool
+    monitor = PoolMonitor([engine], 60, adaptive=True, max_size=6, target_wait=0.01)
+
+    # Every checkout waited well past the target
+    for _ in range(20):
+        pool.metrics.observe(0.05, pool.limit())
+    assert monitor.check(engine) == 5
+    for _ in range(20):
+        pool.metrics.observe(0.05, pool.limit())
+    assert monitor.check(engine) == 6
+    for _ in range(20):
+        pool.metrics.observe(0.05, pool.limit())
+    assert monitor.check(engine) is None
+
+    # The raised limit is usable
+    connections = [pool.connect() for _ in range(6)]
+    for connection in connections:
+        connection.close()
+
+    # Quiet traffic brings it back to the configured limit, and no lower
+    pool.metrics.drain()
+    limits = []
+    for _ in range(4):
+        for _ in range(20):
+            pool.metrics.observe(0.0, 1)
+        limits.append(monitor.check(engine))
+    assert limits == [5, 4, None, None]
+    assert pool.limit() == 4
+    engine.dispose()
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+from app.core.config import settings
+from app.db.query_counter import assert_max_queries
+
+from conftest import auth_headers, make_conversation, make_user
+
+API = settings.API_V1_STR
+
+
+@pytest.fixture
+def inbox(db):
+    """
+    User 1 in ten conversations of twenty messages each: enough rows that a
+    per-row lazy load would blow the limits below
+    """
+    for user_id in range(1, 12):
+        make_user(db, user_id)
+    for conversation_id in range(1, 11):
+        make_conversation(db, conversation_id, 1, conversation_id + 1, messages=20)
+
+
+@pytest.fixture
+def headers():
+    # One token throughout: the first request verifies it and loads the
+    # user, later ones are answered from the token cache
+    return auth_headers(1)
+
+
+def test_conversation_list_queries(client, inbox, headers, counted_engine):
+    assert client.get(f"{API}/conversations", headers=headers).status_code == 200
+    with assert_max_queries(counted_engine, 4):
+        response = client.get(f"{API}/conversations", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 10
+
+
+def test_message_list_queries(client, inbox, headers, counted_engine):
+    assert client.get(f"{API}/conversations/1/messages", headers=headers).status_code == 200
+    with assert_max_queries(counted_engine, 2):
+        response = client.get(f"{API}/conversations/1/messages", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 20
+
+
+def test_search_queries(client, db, headers, counted_engine):
+    try:
+        from app.api import search
+        from app.models import Event, Research, Resource
+    except ImportError:
+        pytest.skip("needs the research, event and resource models")
+
+    client.app.include_router(search.router, prefix=API)
+    user = make_user(db, 1, full_name="Ann")
+    for i in range(1, 11):
+        day = datetime(2024, 1, i)
+        db.add(Research(title=f"levee study {i}", description="delta", era="modern", status="active",
+                        start_date=day, lead_researcher=user))
+        db.add(Event(title=f"levee walk {i}", description="delta", date=day, status="open", type="talk",
+                     location="New Orleans"))
+        db.add(Resource(title=f"levee map {i}", description="delta", type="map", format="pdf",
+                        created_at=day, author=user))
+    db.commit()
+
+    # Loads the search index; a different query below so the page cache can't answer it
+    assert client.get(f"{API}/search", params={"q": "delta"}, headers=headers).status_code == 200
+    with assert_max_queries(counted_engine, 3):
+        response = client.get(f"{API}/search", params={"q": "levee", "limit": 5}, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 5
@@ -0,0 +1,168 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from app.core.config import settings
+
+from conftest import auth_headers, make_user
+
+try:
+    from app.api import search
+    from app.core.search_backend import LikeSearchBackend, search_backend
+    from app.core.search_cache import search_cache
+    from app.models import Event, Research, Resource
+except ImportError:
+    # The search stack needs the Research, Event and Resource models
+    pytest.skip("content models are not available", allow_module_level=True)
+
+API = settings.API_V1_STR
+
+
+@pytest.fixture
+def search_client(client, monkeypatch):
+    """
+    The test client with the search router and an empty inverted index,
+    rebuilt from the database by the first search
+    """
+    monkeypatch.setattr(settings, "SEARCH_BACKEND", "inverted")
+    if os.path.exists(settings.SEARCH_INDEX_PATH):
+        os.remove(settings.SEARCH_INDEX_PATH)
+    search_backend.ready = False
+    search_backend.queued = []
+    search_backend.store.indexes = {}
+    search_backend.store.marks = {}
+    if search_cache is not None:
+        search_cache.backend.clear()
+    client.app.include_router(search.router, prefix=API)
+    return client
+
+
+@pytest.fixture
+def headers(db):
+    make_user(db, 1, full_name="Ann")
+    return auth_headers(1)
+
+
+def add_research(db, count: int, **values):
+    for i in range(count):
+        fields = {"title": "levee study", "description": "delta", "era": "modern", "status": "active",
+                  "start_date": datetime(2024, 1, i + 1)}
+        fields.update(values)
+        db.add(Research(**fields))
+    db.commit()
+
+
+def pages(client, headers, **params):
+    """
+    Every page of a search, following next_cursor to the end
+    """
+    results = []
+    cursor = None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        response = client.get(f"{API}/search", params=query, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page["items"]) <= params.get("limit", 20)
+        results.append(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return results
+
+
+def test_date_order_is_not_limited_to_the_best_scores(search_client, db, headers, monkeypatch):
+    monkeypatch.setattr(search_backend, "max_candidates", 3)
+    # Old documents mention the term often and outscore the newer ones
+    add_research(db, 4, title="levee levee levee", start_date=datetime(2000, 1, 1))
+    add_research(db, 6)
+
+    found = [item for page in pages(search_client, headers, q="levee", sort="date", limit=2) for item in page]
+
+    assert len(found) == 10
+    dates = [item["date"] for item in found]
+    assert dates == sorted(dates, reverse=True)
+    assert dates[0].startswith("2024-01-06")
+
+
+def test_filtered_pages_end_at_the_candidate_bound(search_client, db, headers, monkeypatch):
+    monkeypatch.setattr(search_backend, "max_candidates", 3)
+    add_research(db, 8, status="archived")
+    add_research(db, 2, status="active", start_date=datetime(2023, 1, 1))
+
+    results = pages(search_client, headers, q="levee", sort="date", status=["active"], limit=5)
+
+    # The eight newer archived matches are looked at three at a time
+    assert len(results) > 1
+    assert [item["date"][:10] for page in results for item in page] == ["2023-01-01", "2023-01-01"]
+
+
+def add_mixed(db):
+    user = db.get(Research.lead_researcher.mapper.class_, 1)
+    for i in range(1, 6):
+        day = datetime(2024, 2, i)
+        db.add(Research(title=f"levee study {i}", description="delta", era="modern", status="active",
+                        start_date=day, lead_researcher=user))
+        db.add(Event(title=f"levee walk {i}", description="delta", date=day, status="open", type="talk",
+                     location="New Orleans"))
+        db.add(Resource(title=f"levee map {i}", description="delta", type="map", format="pdf",
+                        created_at=day, author=user))
+    db.add(Research(title="levee levee levee", description="levee", era="modern", status="active",
+                    start_date=datetime(1990, 1, 1), lead_researcher=user))
+    db.add(Event(title="bayou walk", description="swamp", date=datetime(2024, 3, 1), status="open",
+                 type="talk", location="Houma"))
+    db.commit()
+
+
+def test_inverted_index_ranks_by_relevance(search_client, db, headers):
+    add_mixed(db)
+
+    items = search_client.get(f"{API}/search", params={"q": "levee"}, headers=headers).json()["items"]
+
+    assert len(items) == 16
+    scores = [item["score"] for item in items]
+    assert scores == sorted(scores, reverse=True)
+    assert all(score > 0 for score in scores)
+    assert "bayou walk" not in {item["title"] for item in items}
+    # Joined columns arrive without lazy loads
+    assert {item["metadata"]["lead_researcher"] for item in items if item["type"] == "research"} == {"Ann"}
+
+    # Scores compare within a type: each has its own index statistics
+    research = search_client.get(f"{API}/search", params={"q": "levee", "type": "research"}, headers=headers)
+    titles = [item["title"] for item in research.json()["items"]]
+    assert titles == ["levee levee levee"] + [f"levee study {i}" for i in range(5, 0, -1)]
+
+
+@pytest.mark.parametrize("sort", ["relevance", "date"])
+def test_cursor_pages_continue_the_full_result(search_client, db, headers, sort):
+    add_mixed(db)
+    everything = search_client.get(f"{API}/search", params={"q": "levee", "sort": sort, "limit": 100},
+                                   headers=headers).json()["items"]
+
+    results = pages(search_client, headers, q="levee", sort=sort, limit=3)
+
+    assert [len(page) for page in results] == [3, 3, 3, 3, 3, 1]
+    assert [item for page in results for item in page] == everything
+
+
+def test_type_filter(search_client, db, headers):
+    add_mixed(db)
+
+    items = search_client.get(f"{API}/search", params={"q": "walk", "type": "events"}, headers=headers).json()["items"]
+    assert {item["type"] for item in items} == {"event"}
+    assert len(items) == 6
+
+    items = search_client.get(f"{API}/search", params={"q": "levee", "type": "resources"}, headers=headers).json()["items"]
+    assert [item["title"] for item in items] == [f"levee map {i}" for i in range(5, 0, -1)]
+
+
+def test_sql_ranked_fallback(search_client, db, headers, monkeypatch):
+    # Backends that rank in SQL (MySQL FULLTEXT, LIKE) filter, score and page in the query
+    monkeypatch.setattr(search, "search_backend", LikeSearchBackend())
+    add_mixed(db)
+
+    results = pages(search_client, headers, q="leve", type="research", limit=2)
+
+    titles = [item["title"] for page in results for item in page]
+    assert titles == [f"levee study {i}" for i in range(5, 0, -1)] + ["levee levee levee"]
+    assert len(results) == 3
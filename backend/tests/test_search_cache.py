@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import MemoryCache
+from app.core.search_index import DocumentChange
+
+try:
+    from app.core.search_cache import SearchCache
+except ImportError:
+    # The search stack needs the Research, Event and Resource models
+    pytest.skip("content models are not available", allow_module_level=True)
+
+
+class UnreachableCache:
+    """
+    A networked backend whose server is down
+    """
+    blocking = True
+    errors = (ConnectionError,)
+
+    def __getattr__(self, name):
+        def fail(*args):
+            raise ConnectionError("connection refused")
+        return fail
+
+
+def key(cache: SearchCache, q: str = "levee"):
+    return asyncio.run(cache.key(["research"], q, None, None, None, None, None, "relevance", 20, None))
+
+
+def test_unreachable_backend_means_uncached():
+    cache = SearchCache(UnreachableCache())
+    assert key(cache) is None
+    assert asyncio.run(cache.get("search:x")) is None
+    asyncio.run(cache.set("search:x", b"{}"))
+    cache.invalidate([DocumentChange("research", 1, "text")])
+
+
+def test_commit_moves_the_key():
+    cache = SearchCache(MemoryCache(60, 10, 1024))
+    before = key(cache)
+    asyncio.run(cache.set(before, b"{}"))
+    assert asyncio.run(cache.get(before)) == b"{}"
+
+    cache.invalidate([DocumentChange("research", 1, "text")])
+    assert key(cache) != before
+    assert key(cache, "  LEVEE ") == key(cache)
@@ -0,0 +1,42 @@
+import logging
+
+from app.core.config import Settings, settings
+
+from conftest import auth_headers, make_user
+
+API = settings.API_V1_STR
+
+
+def test_stats_stay_server_side_by_default(client, db, monkeypatch, caplog):
+    for name in ("SQL_STATS_HEADER", "SQL_SLOW_REQUEST_THRESHOLD"):
+        monkeypatch.setattr(settings, name, Settings.model_fields[name].default)
+    make_user(db, 1)
+    caplog.set_level(logging.INFO, logger="app.sql")
+
+    response = client.get(f"{API}/notifications", headers=auth_headers(1))
+
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+    assert not [record for record in caplog.records if record.name == "app.sql"]
+
+
+def test_slow_requests_are_logged(client, db, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SQL_SLOW_REQUEST_THRESHOLD", 0)
+    make_user(db, 1)
+    caplog.set_level(logging.INFO, logger="app.sql")
+
+    client.get(f"{API}/notifications", headers=auth_headers(1))
+
+    [record] = [record for record in caplog.records if record.name == "app.sql"]
+    assert record.levelno == logging.INFO
+    assert record.path == f"{API}/notifications"
+    assert record.sql_queries > 0
+
+
+def test_server_timing_header_is_opt_in(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "SQL_STATS_HEADER", True)
+    make_user(db, 1)
+
+    response = client.get(f"{API}/notifications", headers=auth_headers(1))
+
+    assert response.headers["server-timing"].startswith('db;desc="')
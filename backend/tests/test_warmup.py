@@ -0,0 +1,38 @@
+import asyncio
+
+from app.api import messages, notifications  # noqa: F401 - registers their hot statements
+from app.db.query_counter import QueryCounter
+from app.db.warmup import compile_hot_statements, hot_statements
+
+from conftest import make_conversation, make_user
+
+
+def test_warmup_runs_only_selects(db, counted_engine):
+    make_user(db, 1)
+    with QueryCounter(counted_engine) as counter:
+        warmed = asyncio.run(compile_hot_statements())
+
+    assert warmed == len(hot_statements)
+    selects = [statement for statement, _ in hot_statements if statement.is_select]
+    assert 0 < len(selects) < len(hot_statements)
+    executed = [sql.lstrip().split()[0].upper() for sql in counter.statements]
+    assert set(executed) <= {"SELECT", "WITH", "BEGIN", "ROLLBACK"}, counter.statements
+    assert executed.count("SELECT") + executed.count("WITH") == len(selects)
+
+
+def test_hot_statement_placeholders_match_no_rows(db):
+    make_user(db, 1)
+    make_user(db, 2)
+    make_conversation(db, 1, 1, 2, messages=3)
+    registered = [statement for statement, _ in hot_statements]
+    for statement in (messages.MARK_READ_AS_USER1, messages.MARK_READ_AS_USER2, messages.MESSAGES_BEFORE):
+        assert any(entry is statement for entry in registered)
+
+    for statement, params in hot_statements:
+        result = db.execute(statement, params)
+        if statement.is_select:
+            # Aggregates still return their one row, of zeros and NULLs
+            assert not any(any(row) for row in result), statement
+        else:
+            assert result.rowcount == 0, statement
+    db.rollback()
@@ -0,0 +1,201 @@
+import asyncio
+import json
+
+import msgpack
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.core import websocket
+from app.core.config import settings
+from app.core.message_bus import InProcessMessageBus
+from app.core.websocket import COALESCE, DISCONNECT, DROP_OLDEST, Connection, ConnectionManager
+
+from conftest import auth_headers, make_user, token_for
+
+API = settings.API_V1_STR
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+
+    async def send_text(self, frame):
+        self.sent.append(frame)
+
+    async def send_bytes(self, frame):
+        self.sent.append(frame)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+def test_disconnect_policy_keeps_its_close_task():
+    socket = FakeSocket()
+    forgotten = []
+
+    async def overflow():
+        connection = Connection(1, socket, 1, DISCONNECT, 1.0, on_close=forgotten.append)
+        connection.enqueue({"type": "a"})
+        connection.enqueue({"type": "b"})
+        assert len(websocket.closing) == 1
+        await asyncio.gather(*websocket.closing)
+        return connection
+
+    connection = asyncio.run(overflow())
+    assert socket.close_code == 1013
+    assert forgotten == [connection]
+    assert not websocket.closing
+
+
+async def settle():
+    # Let writer tasks run their sends
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def overflowed(policy: str, messages: list) -> tuple:
+    """
+    Queue `messages` faster than the writer can run, then let it deliver;
+    returns what the client received and the connection
+    """
+    socket = FakeSocket()
+
+    async def run():
+        connection = Connection(1, socket, 2, policy, 1.0, on_close=lambda connection: None)
+        for message in messages:
+            connection.enqueue(message)
+        await settle()
+        await connection.close()
+        return connection
+
+    connection = asyncio.run(run())
+    return [json.loads(frame) for frame in socket.sent], connection
+
+
+def test_drop_oldest_policy():
+    received, connection = overflowed(DROP_OLDEST, [{"type": "a"}, {"type": "b"}, {"type": "c"}])
+    assert received == [{"type": "b"}, {"type": "c"}]
+    assert connection.dropped == 1
+
+
+def test_coalesce_policy_replaces_the_stale_message():
+    received, connection = overflowed(COALESCE, [
+        {"type": "unread_count", "count": 1},
+        {"type": "new_message", "id": 1},
+        {"type": "unread_count", "count": 2},
+        {"type": "typing", "coalesce_key": "typing:1"},
+        {"type": "typing", "coalesce_key": "typing:1", "last": True},
+    ])
+    # The second count takes the first one's place; with nothing to merge
+    # into, the oldest pending message is dropped instead
+    assert received == [{"type": "new_message", "id": 1}, {"type": "typing", "coalesce_key": "typing:1", "last": True}]
+    assert connection.dropped == 3
+
+
+def test_disconnect_policy_stops_queueing():
+    received, connection = overflowed(DISCONNECT, [{"type": "a"}, {"type": "b"}, {"type": "c"}, {"type": "d"}])
+    assert connection.websocket.close_code == 1013
+    # Nothing past the full queue is kept or sent
+    assert {message["type"] for message in received + list(connection.queue)} <= {"a", "b"}
+    assert connection.dropped == 0
+
+
+def test_every_device_of_a_user_receives_a_message():
+    sockets = [FakeSocket() for _ in range(3)]
+
+    async def run():
+        manager = ConnectionManager(channel="devices", bus=InProcessMessageBus())
+        manager.add_connection(1, sockets[0])
+        manager.add_connection(1, sockets[1])
+        manager.add_connection(2, sockets[2])
+        assert (manager.connection_count(1), manager.connection_count(2), manager.total_connections) == (2, 1, 3)
+
+        await manager.send_personal_message(1, {"type": "hello"})
+        await settle()
+        manager.disconnect(sockets[0])
+        await manager.send_personal_message(1, {"type": "again"})
+        await settle()
+
+        assert (manager.connection_count(1), manager.total_connections) == (1, 2)
+        manager.disconnect(sockets[1])
+        manager.disconnect(sockets[2])
+        assert not manager.is_connected(1) and manager.total_connections == 0
+
+    asyncio.run(run())
+    assert sockets[0].sent == ['{"type":"hello"}']
+    assert sockets[1].sent == ['{"type":"hello"}', '{"type":"again"}']
+    assert sockets[2].sent == []
+
+
+def test_batches_msgpack_frames_after_a_json_greeting():
+    socket = FakeSocket()
+    greeting = {"type": "ready", "batch": True, "encoding": "msgpack"}
+
+    async def run():
+        connection = Connection(1, socket, 100, DROP_OLDEST, 1.0, on_close=lambda connection: None,
+                                batch_size=3, batch_delay=0.01, encoding="msgpack", greeting=greeting)
+        for i in range(5):
+            connection.enqueue({"type": "n", "i": i})
+        await settle()
+        # A lone event waits out the delay, then goes in a batch of its own
+        connection.enqueue({"type": "n", "i": 5})
+        await asyncio.sleep(0.05)
+        await connection.close()
+
+    asyncio.run(run())
+    assert json.loads(socket.sent[0]) == greeting
+    frames = [msgpack.unpackb(frame) for frame in socket.sent[1:]]
+    assert [frame["type"] for frame in frames] == ["batch"] * 3
+    assert [[event["i"] for event in frame["events"]] for frame in frames] == [[0, 1, 2], [3, 4], [5]]
+
+
+def test_negotiates_batched_msgpack_delivery(client, db):
+    make_user(db, 1)
+    make_user(db, 2, is_superuser=True)
+    auth = {"type": "auth", "token": token_for(1), "batch": True, "encoding": "msgpack"}
+    with client.websocket_connect(f"{API}/ws/notifications/1") as socket:
+        socket.send_json(auth)
+        assert socket.receive_json() == {"type": "ready", "batch": True, "encoding": "msgpack"}
+        for text in ("one", "two"):
+            sent = client.post(f"{API}/notifications/bulk", json={"type": "t", "message": text, "user_ids": [1]},
+                               headers=auth_headers(2))
+            assert sent.status_code == 200
+
+        events = []
+        while len(events) < 2:
+            frame = msgpack.unpackb(socket.receive_bytes())
+            assert frame["type"] == "batch"
+            events.extend(frame["events"])
+    assert [event["data"]["message"] for event in events] == ["one", "two"]
+
+
+def test_unknown_encoding_falls_back_to_json(client, db):
+    make_user(db, 1)
+    with client.websocket_connect(f"{API}/ws/notifications/1") as socket:
+        socket.send_json({"type": "auth", "token": token_for(1), "encoding": "xml"})
+        assert socket.receive_json() == {"type": "ready", "batch": False, "encoding": "json"}
+
+
+def test_authenticates_a_binary_first_frame(client, db):
+    make_user(db, 1)
+    auth = {"type": "auth", "token": token_for(1), "encoding": "json"}
+    with client.websocket_connect(f"{API}/ws/notifications/1") as socket:
+        socket.send_bytes(json.dumps(auth).encode())
+        assert socket.receive_json() == {"type": "ready", "batch": False, "encoding": "json"}
+        socket.send_bytes(b"pong")
+        socket.send_text("pong")
+
+
+def test_rejects_a_bad_token_sent_as_bytes(client, db):
+    make_user(db, 1)
+    with client.websocket_connect(f"{API}/ws/notifications/1") as socket:
+        socket.send_bytes(json.dumps({"type": "auth", "token": "nope"}).encode())
+        with pytest.raises(WebSocketDisconnect) as closed:
+            socket.receive_text()
+    assert closed.value.code == 1008
+
+
+def test_client_leaving_before_auth(client):
+    with client.websocket_connect(f"{API}/ws/notifications/1"):
+        pass